@@ -0,0 +1,647 @@
+import numpy as np
+import pandas as pd
+from .config.config_interface import (
+    codigos_promocao_excluidos,
+    colunas_vendas_correlacionadas,
+    custo_encarte_modelo_unico,
+    custo_encarte_multiplos_modelos,
+    motor_consultas,
+)
+from .config.config_transform import tipos_arrow
+
+# Métricas somadas por promoção, por SKU e por loja
+colunas_metricas = ["Quantidade", "Desconto Aplicado", "Lucro Bruto"]
+# Chave de um período: o prefixo se repete em outros meses, o início da janela não
+colunas_periodo = ["Prefixo Periodo", "Inicio Periodo"]
+
+# Colunas das vendas usadas na correlação e nos insights
+colunas_vendas = [
+    "Loja",
+    "Data",
+    "Item",
+    "Desc.Item",
+    "Quantidade",
+    "Pr.Venda.Un",
+    "Pr.Venda Total",
+    "Promoção",
+]
+
+
+# Função para converter uma coluna em texto: com tipos_arrow, em string[pyarrow];
+# sem ele, em objetos str do NumPy
+def como_texto(serie):
+    if tipos_arrow:
+        return serie.astype("string[pyarrow]")
+    return serie.astype(str)
+
+
+# Função para obter o prefixo do período (tudo antes do último " - ")
+def obter_prefixo_periodo(nome_promocao):
+    return " - ".join(nome_promocao.split(" - ")[:-1])
+
+
+# Função para separar em janelas de validade as linhas que repetem o mesmo
+# prefixo: o nome dos tabloides traz só os dias ("TABLOIDE 10 A 22"), então o
+# mesmo prefixo volta em outros meses e anos. Cada período é uma janela contínua
+# e uma nova começa quando a data inicial passa do fim das anteriores. Retorna o
+# número da janela de cada linha dentro do seu prefixo (0, 1, ...).
+def janelas_periodos(prefixos, inicios, fins):
+    ordem = pd.DataFrame(
+        {
+            "prefixo": prefixos.to_numpy(),
+            "inicio": pd.to_datetime(inicios).to_numpy(),
+            "fim": pd.to_datetime(fins).to_numpy(),
+        }
+    ).sort_values(["prefixo", "inicio"], kind="stable")
+    grupos = ordem.groupby("prefixo", sort=False)
+    fim_anterior = grupos["fim"].cummax().groupby(ordem["prefixo"]).shift()
+    nova_janela = fim_anterior.isna() | (ordem["inicio"] > fim_anterior)
+    janelas = nova_janela.groupby(ordem["prefixo"]).cumsum() - 1
+    return pd.Series(janelas.sort_index().to_numpy(), index=prefixos.index)
+
+
+# Função para separar o nome das promoções ("TABLOIDE 01 A 13 - EF") em colunas
+# tipadas: prefixo do período, modelo do encarte (o que vem depois do último
+# " - ") e as datas de início e fim da janela de validade do período
+def estruturar_promocoes(relatorio):
+    # Sem nenhum tabloide no relatório, as colunas são criadas vazias
+    if relatorio.empty:
+        return relatorio.assign(
+            **{
+                "Prefixo Periodo": pd.Categorical([]),
+                "Modelo Encarte": pd.Categorical([]),
+                "Inicio Periodo": pd.Series(dtype="datetime64[ns]"),
+                "Fim Periodo": pd.Series(dtype="datetime64[ns]"),
+            }
+        )
+    partes = como_texto(relatorio["Nome Promocao"]).str.rpartition(" - ")
+    relatorio["Prefixo Periodo"] = partes[0].astype("category")
+    relatorio["Modelo Encarte"] = partes[2].astype("category")
+    janelas = janelas_periodos(
+        partes[0], relatorio["Data Inicial"], relatorio["Data Final"]
+    )
+    periodos = relatorio.groupby([partes[0], janelas], sort=False)
+    relatorio["Inicio Periodo"] = periodos["Data Inicial"].transform("min")
+    relatorio["Fim Periodo"] = periodos["Data Final"].transform("max")
+    return relatorio
+
+
+# Função para montar o índice das promoções do relatório: as linhas ordenadas
+# pela data inicial (com a data final na mesma ordem), para achar por busca
+# binária as promoções de um intervalo, e as linhas de cada prefixo de período
+# em uma faixa contígua, localizada por dicionário
+def indexar_promocoes(relatorio):
+    inicios = relatorio["Data Inicial"].to_numpy("datetime64[ns]")
+    fins = relatorio["Data Final"].to_numpy("datetime64[ns]")
+    ordem_inicio = np.argsort(inicios, kind="stable")
+
+    if "Prefixo Periodo" in relatorio.columns:
+        prefixos = relatorio["Prefixo Periodo"]
+    else:
+        prefixos = relatorio["Nome Promocao"].map(obter_prefixo_periodo)
+    codigos, valores = pd.factorize(prefixos)
+    ordem_periodo = np.argsort(codigos, kind="stable")
+    limites = np.searchsorted(codigos[ordem_periodo], np.arange(len(valores) + 1))
+
+    return {
+        "relatorio": relatorio,
+        "inicios": inicios,
+        "fins": fins,
+        "ordem_inicio": ordem_inicio,
+        "inicios_ordenados": inicios[ordem_inicio],
+        "fins_ordenados": fins[ordem_inicio],
+        "ordem_periodo": ordem_periodo,
+        "periodos": {
+            str(prefixo): (int(limites[i]), int(limites[i + 1]))
+            for i, prefixo in enumerate(valores)
+        },
+    }
+
+
+# Função para consultar o índice: promoções contidas no intervalo de datas (sem
+# data, o intervalo fica aberto daquele lado) e, opcionalmente, de um único
+# período. As linhas voltam na ordem do relatório.
+def consultar_promocoes(
+    indice, data_inicial=None, data_final=None, prefixo_periodo=None
+):
+    inicio = None if data_inicial is None else np.datetime64(pd.Timestamp(data_inicial))
+    fim = None if data_final is None else np.datetime64(pd.Timestamp(data_final))
+
+    if prefixo_periodo is not None:
+        # Linhas do período, conferindo as datas apenas nelas
+        faixa = indice["periodos"].get(prefixo_periodo, (0, 0))
+        posicoes = indice["ordem_periodo"][slice(*faixa)]
+        mascara = np.ones(len(posicoes), dtype=bool)
+        if inicio is not None:
+            mascara &= indice["inicios"][posicoes] >= inicio
+        if fim is not None:
+            mascara &= indice["fins"][posicoes] <= fim
+        posicoes = posicoes[mascara]
+    else:
+        # Como a data final não é anterior à inicial, as promoções do intervalo
+        # começam entre inicio e fim: uma faixa da ordem por data inicial
+        inicios = indice["inicios_ordenados"]
+        esquerda = 0 if inicio is None else np.searchsorted(inicios, inicio, "left")
+        direita = (
+            len(inicios) if fim is None else np.searchsorted(inicios, fim, "right")
+        )
+        posicoes = indice["ordem_inicio"][esquerda:direita]
+        if fim is not None:
+            posicoes = posicoes[indice["fins_ordenados"][esquerda:direita] <= fim]
+    return indice["relatorio"].iloc[np.sort(posicoes)]
+
+
+# Função para selecionar as linhas de uma tabela do dashboard sem copiá-la:
+# filtra pelo texto (sem diferenciar maiúsculas) nas colunas indicadas e ordena
+# pela coluna escolhida. Retorna as posições das linhas na ordem de exibição.
+def selecionar_linhas(
+    dados, texto=None, colunas_texto=None, ordenar_por=None, crescente=True
+):
+    posicoes = np.arange(len(dados))
+    if texto:
+        mascara = np.zeros(len(dados), dtype=bool)
+        for coluna in colunas_texto or dados.columns:
+            if coluna not in dados.columns:
+                continue
+            valores = dados[coluna]
+            if isinstance(valores.dtype, pd.CategoricalDtype):
+                # Testa cada categoria uma vez e propaga pelos códigos
+                categorias = como_texto(pd.Series(valores.cat.categories)).str.contains(
+                    texto, case=False, regex=False, na=False
+                )
+                encontradas = np.append(categorias.to_numpy(dtype=bool), False)
+                mascara |= encontradas[valores.cat.codes.to_numpy()]
+            else:
+                mascara |= (
+                    como_texto(valores)
+                    .str.contains(texto, case=False, regex=False, na=False)
+                    .to_numpy(dtype=bool)
+                )
+        posicoes = np.flatnonzero(mascara)
+
+    if ordenar_por is not None:
+        valores = dados[ordenar_por].iloc[posicoes].reset_index(drop=True)
+        ordem = valores.sort_values(
+            ascending=crescente, kind="stable", na_position="last"
+        ).index.to_numpy()
+        posicoes = posicoes[ordem]
+    return posicoes
+
+
+# Função para obter apenas as linhas de uma página (numerada a partir de 1)
+def pagina_da_tabela(dados, posicoes, pagina, tamanho_pagina):
+    inicio = (pagina - 1) * tamanho_pagina
+    return dados.iloc[posicoes[inicio : inicio + tamanho_pagina]]
+
+
+# Função para reduzir as vendas a quantidades e receita por SKU, loja e dia
+# (mantendo a quantidade de cada linha, usada na regra de ativação)
+def agregar_vendas(vendas, codigos_excluidos=codigos_promocao_excluidos):
+    # Filtrar vendas para remover itens com os códigos excluídos na coluna Promoção
+    vendas = vendas[~vendas["Promoção"].isin(codigos_excluidos)]
+    agregadas = (
+        vendas.groupby(
+            ["Item", "Loja", "Data", "Quantidade"],
+            sort=False,
+            observed=True,
+            dropna=False,
+        )
+        .agg(
+            Quantidade_Total=("Quantidade", "sum"),
+            Valor_Vendido=("Pr.Venda Total", "sum"),
+            Linhas=("Quantidade", "size"),
+        )
+        .reset_index()
+        .rename(
+            columns={
+                "Quantidade": "Quantidade Linha",
+                "Quantidade_Total": "Quantidade",
+                "Valor_Vendido": "Valor Vendido",
+            }
+        )
+    )
+    agregadas = agregadas[agregadas["Quantidade Linha"].notna()]
+    agregadas["SKU"] = como_texto(agregadas["Item"])
+    return agregadas
+
+
+# Função para correlacionar itens entre os dois relatórios, considerando apenas
+# as vendas dentro do período de validade de cada promoção
+def correlacionar_vendas(
+    promocoes, vendas, codigos_excluidos=codigos_promocao_excluidos
+):
+    promocoes = promocoes.assign(
+        SKU=como_texto(promocoes["SKU"]),
+        **{
+            "Data Inicial": pd.to_datetime(promocoes["Data Inicial"]),
+            "Data Final": pd.to_datetime(promocoes["Data Final"]),
+        },
+    )
+
+    # Descartar antes da agregação as vendas de outros SKUs ou fora dos períodos
+    skus = pd.to_numeric(promocoes["SKU"], errors="coerce").dropna().unique()
+    vendas = vendas[
+        vendas["Item"].isin(skus)
+        & (vendas["Data"] >= promocoes["Data Inicial"].min())
+        & (vendas["Data"] <= promocoes["Data Final"].max())
+    ]
+    vendas = agregar_vendas(vendas, codigos_excluidos).reset_index(drop=True)
+
+    # Junção por intervalo: cada promoção é expandida nos dias da sua validade
+    # e juntada às vendas por SKU e dia, então só os pares de fato válidos
+    # são gerados (e não todas as vendas do SKU para cada promoção)
+    inicios = promocoes["Data Inicial"].dt.normalize()
+    dias = (
+        ((promocoes["Data Final"].dt.normalize() - inicios).dt.days + 1)
+        .fillna(0)
+        .clip(lower=0)
+        .to_numpy(dtype=np.int64)
+    )
+    posicoes = np.repeat(np.arange(len(promocoes)), dias)
+    deslocamentos = np.arange(len(posicoes)) - np.repeat(np.cumsum(dias) - dias, dias)
+    datas = inicios.to_numpy()[posicoes] + deslocamentos.astype("timedelta64[D]")
+    validade = pd.DataFrame(
+        {
+            "SKU": promocoes["SKU"].to_numpy()[posicoes],
+            "Data": datas,
+            "promocao": posicoes,
+        }
+    )
+    pares = pd.merge(
+        validade,
+        pd.DataFrame(
+            {
+                "SKU": vendas["SKU"],
+                "Data": vendas["Data"].dt.normalize(),
+                "venda": np.arange(len(vendas)),
+            }
+        ),
+        on=["SKU", "Data"],
+        how="inner",
+    ).sort_values(["promocao", "venda"], kind="stable")
+
+    # Pares na ordem das promoções e, em cada uma, na ordem das vendas
+    esquerda = promocoes.take(pares["promocao"].to_numpy())
+    direita = vendas.take(pares["venda"].to_numpy()).drop(columns=["SKU"])
+    esquerda.index = direita.index = pd.RangeIndex(len(pares))
+    correlacionados = pd.concat([esquerda, direita], axis=1)
+    correlacionados = correlacionados[
+        (correlacionados["Data"] >= correlacionados["Data Inicial"])
+        & (correlacionados["Data"] <= correlacionados["Data Final"])
+        & (correlacionados["Quantidade Linha"] >= correlacionados["Ativacao"])
+    ].reset_index(drop=True)
+    correlacionados["Desconto Aplicado"] = (
+        correlacionados["Preco Vendido"] - correlacionados["Preco Promocao"]
+    ) * correlacionados["Quantidade"]
+    correlacionados["Lucro Bruto"] = (
+        correlacionados["Preco Promocao"] * correlacionados["Quantidade"]
+    )
+    return correlacionados
+
+
+def calcular_custos_encarte(correlacionados, nome_promocao):
+    # Identifica o prefixo do período com base na promoção selecionada
+    prefixo_periodo = " - ".join(
+        nome_promocao.split(" - ")[:-1]
+    )  # Pega tudo antes do último " - "
+
+    # Usa o modelo do encarte já separado no relatório tratado; sem ele,
+    # analisa apenas os nomes distintos de promoção, não cada linha de venda
+    if "Modelo Encarte" in correlacionados.columns:
+        mascara = correlacionados["Prefixo Periodo"] == prefixo_periodo
+        filtrados = correlacionados.loc[
+            mascara, ["SKU", "Preco Promocao", "Modelo Encarte"]
+        ].rename(columns={"Modelo Encarte": "Loja"})
+    else:
+        nomes = correlacionados["Nome Promocao"]
+        nomes_unicos = pd.unique(nomes)
+        nomes_periodo = [
+            nome for nome in nomes_unicos if nome.startswith(prefixo_periodo)
+        ]
+        lojas = {nome: nome.split(" - ")[1] for nome in nomes_periodo}
+        mascara = nomes.isin(nomes_periodo)
+        filtrados = correlacionados.loc[mascara, ["SKU", "Preco Promocao"]].assign(
+            Loja=nomes[mascara].map(lojas)
+        )
+
+    # Último preço promocional de cada SKU em cada loja
+    precos = filtrados.drop_duplicates(subset=["SKU", "Loja"], keep="last")
+
+    # Modelo único quando cada SKU tem um só preço promocional entre as lojas
+    modelo_unico = not precos["Preco Promocao"].isna().any() and bool(
+        (precos.groupby("SKU")["Preco Promocao"].nunique() <= 1).all()
+    )
+
+    # Define o custo com base no modelo identificado
+    if modelo_unico:
+        return custo_encarte_modelo_unico
+    return custo_encarte_multiplos_modelos
+
+
+# Função para calcular os insights a partir dos totais já somados
+def insights_dos_totais(total_itens, total_desconto, lucro_bruto, custo_encarte):
+    lucro_liquido = lucro_bruto - custo_encarte - total_desconto
+    custo_total = total_desconto + custo_encarte
+    return total_itens, total_desconto, lucro_bruto, lucro_liquido, custo_total
+
+
+# Função para gerar insights
+def gerar_insights(correlacionados, custo_encarte):
+    return insights_dos_totais(
+        correlacionados["Quantidade"].sum(),
+        correlacionados["Desconto Aplicado"].sum(),
+        correlacionados["Lucro Bruto"].sum(),
+        custo_encarte,
+    )
+
+
+# Função para calcular as métricas de todas as promoções do relatório em uma
+# única leitura das vendas, compartilhada entre os períodos: totais por promoção
+# (com o custo do encarte do período), por SKU e por loja
+def calcular_metricas_promocoes(relatorio, carregar_vendas):
+    if "Inicio Periodo" not in relatorio.columns:
+        relatorio = estruturar_promocoes(relatorio.copy())
+    relatorio = relatorio.assign(
+        **{"Prefixo Periodo": relatorio["Prefixo Periodo"].astype(str)}
+    )
+    relatorio = relatorio[relatorio["Prefixo Periodo"] != ""]
+    if relatorio.empty:
+        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+
+    vendas = carregar_vendas(
+        relatorio["Data Inicial"].min(),
+        relatorio["Data Final"].max(),
+        skus=relatorio["SKU"].unique(),
+        colunas=colunas_vendas,
+    )
+    if vendas.empty:
+        correlacionados = pd.DataFrame(
+            columns=["Nome Promocao", *colunas_periodo, "SKU", "Loja"]
+            + ["Preco Promocao"]
+            + colunas_metricas
+        )
+        meses_com_vendas = pd.DataFrame(columns=["Item", "Mes"])
+    else:
+        correlacionados = correlacionar_vendas(relatorio, vendas)
+        # Pares item/mês com vendas, para saber quais períodos tinham dados
+        meses_com_vendas = pd.DataFrame(
+            {"Item": vendas["Item"], "Mes": vendas["Data"].dt.to_period("M")}
+        ).drop_duplicates()
+    correlacionados_por_periodo = dict(
+        tuple(correlacionados.groupby(colunas_periodo, sort=False, observed=True))
+    )
+
+    por_promocao = []
+    for periodo, promocoes in relatorio.groupby(colunas_periodo, sort=False):
+        correlacionados_periodo = correlacionados_por_periodo.get(
+            periodo, correlacionados.iloc[0:0]
+        )
+        custo_encarte = calcular_custos_encarte(
+            correlacionados_periodo, promocoes["Nome Promocao"].iloc[0]
+        )
+        meses = pd.period_range(
+            promocoes["Inicio Periodo"].iloc[0],
+            promocoes["Fim Periodo"].iloc[0],
+            freq="M",
+        )
+        skus = pd.to_numeric(promocoes["SKU"], errors="coerce")
+
+        nomes = pd.unique(promocoes["Nome Promocao"])
+        datas = promocoes.groupby("Nome Promocao").agg(
+            **{
+                "Data Inicial": ("Data Inicial", "min"),
+                "Data Final": ("Data Final", "max"),
+            }
+        )
+        totais = (
+            correlacionados_periodo.groupby("Nome Promocao")[colunas_metricas]
+            .sum()
+            .reindex(nomes, fill_value=0)
+        )
+        totais.index.name = "Nome Promocao"
+        totais = totais.reset_index()
+        totais["Prefixo Periodo"], totais["Inicio Periodo"] = periodo
+        totais["Fim Periodo"] = promocoes["Fim Periodo"].iloc[0]
+        totais["Linhas Promocao"] = totais["Nome Promocao"].map(
+            promocoes["Nome Promocao"].value_counts()
+        )
+        totais["Vendas Carregadas"] = bool(
+            (
+                meses_com_vendas["Item"].isin(skus)
+                & meses_com_vendas["Mes"].isin(meses)
+            ).any()
+        )
+        totais["Custo Encarte"] = custo_encarte
+        totais["Data Inicial"] = totais["Nome Promocao"].map(datas["Data Inicial"])
+        totais["Data Final"] = totais["Nome Promocao"].map(datas["Data Final"])
+        por_promocao.append(totais)
+
+    por_sku = (
+        correlacionados.groupby(["Nome Promocao", "Inicio Periodo", "SKU"])[
+            colunas_metricas
+        ]
+        .sum()
+        .reset_index()
+    )
+    por_loja = (
+        correlacionados.groupby(["Nome Promocao", "Inicio Periodo", "Loja"])[
+            colunas_metricas
+        ]
+        .sum()
+        .reset_index()
+    )
+    return pd.concat(por_promocao, ignore_index=True), por_sku, por_loja
+
+
+# Função para montar o ranking de rentabilidade dos períodos a partir das
+# métricas por promoção: lucro líquido e cobertura do custo de cada tabloide.
+# Períodos sem vendas carregadas ficam no fim, sem posição.
+def ranquear_promocoes(por_promocao):
+    if por_promocao.empty:
+        return pd.DataFrame()
+    periodos = (
+        por_promocao.groupby(colunas_periodo, sort=False)
+        .agg(
+            **{
+                "Fim Periodo": ("Fim Periodo", "first"),
+                "Data Inicial": ("Data Inicial", "min"),
+                "Data Final": ("Data Final", "max"),
+                "Promocoes": ("Nome Promocao", "nunique"),
+                "Quantidade": ("Quantidade", "sum"),
+                "Desconto Aplicado": ("Desconto Aplicado", "sum"),
+                "Lucro Bruto": ("Lucro Bruto", "sum"),
+                "Custo Encarte": ("Custo Encarte", "first"),
+                "Vendas Carregadas": ("Vendas Carregadas", "all"),
+            }
+        )
+        .reset_index()
+    )
+    _, _, _, lucro_liquido, custo_total = insights_dos_totais(
+        periodos["Quantidade"],
+        periodos["Desconto Aplicado"],
+        periodos["Lucro Bruto"],
+        periodos["Custo Encarte"],
+    )
+    periodos["Lucro Liquido"] = lucro_liquido
+    periodos["Custo Total"] = custo_total
+    periodos["Cobertura"] = lucro_liquido / custo_total.where(custo_total != 0)
+
+    periodos = periodos.sort_values(
+        ["Vendas Carregadas", "Lucro Liquido", "Cobertura"],
+        ascending=[False, False, False],
+        kind="stable",
+        ignore_index=True,
+    )
+    periodos.insert(
+        0,
+        "Posicao",
+        pd.array(
+            [
+                posicao if carregadas else None
+                for posicao, carregadas in enumerate(periodos["Vendas Carregadas"], 1)
+            ],
+            dtype="Int64",
+        ),
+    )
+    return periodos
+
+
+# Função para consultar os insights pré-calculados das promoções selecionadas.
+# Retorna None quando a seleção não corresponde exatamente ao que foi calculado
+# (períodos parciais ou sem vendas), para que o chamador calcule ao vivo.
+def consultar_metricas(metricas, promocoes, nome_promocao):
+    if metricas is None or metricas.empty or "Inicio Periodo" not in metricas:
+        return None
+    prefixo_periodo = obter_prefixo_periodo(nome_promocao)
+    linhas = metricas[metricas["Prefixo Periodo"] == prefixo_periodo]
+    if "Inicio Periodo" in promocoes.columns:
+        # Só a janela das promoções selecionadas; mais de uma vai ao vivo
+        inicios = promocoes["Inicio Periodo"].unique()
+        if len(inicios) != 1:
+            return None
+        linhas = linhas[linhas["Inicio Periodo"] == inicios[0]]
+    # Compara os valores (e não as Series), pois o tipo do texto dos nomes pode
+    # diferir entre o relatório (string[pyarrow]) e as métricas lidas do Parquet
+    selecionadas = promocoes["Nome Promocao"].value_counts().to_dict()
+    calculadas = dict(zip(linhas["Nome Promocao"], linhas["Linhas Promocao"]))
+    if linhas.empty or selecionadas != calculadas:
+        return None
+    if not linhas["Vendas Carregadas"].all():
+        return None
+
+    custo_encarte = linhas["Custo Encarte"].iloc[0]
+    return custo_encarte, insights_dos_totais(
+        linhas["Quantidade"].sum(),
+        linhas["Desconto Aplicado"].sum(),
+        linhas["Lucro Bruto"].sum(),
+        custo_encarte,
+    )
+
+
+# Função para carregar o relatório de promoções tratado (em cache até ele mudar).
+# Os módulos de leitura (pyarrow) só são importados quando necessários.
+def carregar_promocoes(colunas=None):
+    from .cache_resultados import obter_ou_calcular
+    from .dataset_tratado import carregar_relatorio, versao_relatorio
+
+    return obter_ou_calcular(
+        ("relatorio_estruturado", colunas, versao_relatorio()),
+        lambda: carregar_relatorio(colunas=colunas),
+    )
+
+
+# Função para carregar o índice das promoções, montado uma vez por versão do
+# relatório tratado
+def carregar_indice_promocoes(colunas=None):
+    from .cache_resultados import obter_ou_calcular
+    from .dataset_tratado import versao_relatorio
+
+    return obter_ou_calcular(
+        ("indice_promocoes", colunas, versao_relatorio()),
+        lambda: indexar_promocoes(carregar_promocoes(colunas)),
+    )
+
+
+# Função para carregar as vendas das promoções e correlacioná-las. Com o motor
+# "duckdb", o SQL já descarta as vendas fora da validade de cada promoção.
+# Retorna None quando não há vendas no intervalo.
+def correlacionar_promocoes(promocoes, data_inicial, data_final):
+    if motor_consultas == "duckdb":
+        from .consultas_sql import carregar_vendas_promocoes
+
+        historico_vendas = carregar_vendas_promocoes(promocoes, colunas_vendas)
+    else:
+        from .dataset_tratado import carregar_vendas
+
+        historico_vendas = carregar_vendas(
+            data_inicial,
+            data_final,
+            skus=promocoes["SKU"].unique(),
+            colunas=colunas_vendas,
+        )
+    if historico_vendas.empty:
+        return None
+    return correlacionar_vendas(promocoes, historico_vendas)
+
+
+# Função para obter as vendas correlacionadas de um período, para o
+# detalhamento do dashboard (em cache enquanto os dados tratados não mudarem)
+def carregar_vendas_correlacionadas(promocoes, nome_promocao, data_inicial, data_final):
+    from .cache_resultados import obter_ou_calcular
+    from .dataset_tratado import versao_dados
+
+    def calcular():
+        correlacionados = correlacionar_promocoes(promocoes, data_inicial, data_final)
+        if correlacionados is None:
+            return pd.DataFrame(columns=colunas_vendas_correlacionadas)
+        return correlacionados[
+            [c for c in colunas_vendas_correlacionadas if c in correlacionados.columns]
+        ]
+
+    chave = (
+        "vendas_correlacionadas",
+        obter_prefixo_periodo(nome_promocao),
+        str(data_inicial),
+        str(data_final),
+        versao_dados(data_inicial, data_final),
+        # Configuração que muda o resultado
+        tuple(codigos_promocao_excluidos),
+        tuple(colunas_vendas_correlacionadas),
+    )
+    return obter_ou_calcular(chave, calcular)
+
+
+# Função para obter custo e insights de uma promoção: consulta a tabela de
+# métricas gerada pelo transform e, se ela não cobrir a seleção, calcula ao vivo
+# reaproveitando o resultado em cache enquanto os dados tratados não mudarem.
+# Retorna None quando não há vendas no intervalo.
+def analisar_promocao(promocoes, nome_promocao, data_inicial, data_final):
+    from .cache_resultados import obter_ou_calcular
+    from .dataset_tratado import carregar_metricas_promocoes, versao_dados
+
+    metricas = carregar_metricas_promocoes(data_inicial, data_final)
+    resultado = consultar_metricas(metricas, promocoes, nome_promocao)
+    if resultado is not None:
+        return resultado
+
+    def calcular():
+        vendas_correlacionadas = correlacionar_promocoes(
+            promocoes, data_inicial, data_final
+        )
+        if vendas_correlacionadas is None:
+            return None
+        custo_encarte = calcular_custos_encarte(vendas_correlacionadas, nome_promocao)
+        return custo_encarte, gerar_insights(vendas_correlacionadas, custo_encarte)
+
+    chave = (
+        "insights",
+        obter_prefixo_periodo(nome_promocao),
+        str(data_inicial),
+        str(data_final),
+        versao_dados(data_inicial, data_final),
+        # Configuração que muda o resultado
+        tuple(codigos_promocao_excluidos),
+        custo_encarte_modelo_unico,
+        custo_encarte_multiplos_modelos,
+    )
+    return obter_ou_calcular(chave, calcular)
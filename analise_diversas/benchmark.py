@@ -0,0 +1,284 @@
+import argparse
+import importlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from .instrumentacao import MedicaoMemoria
+
+# Arquivo onde os resultados de cada execução são acumulados (JSON lines),
+# dentro da pasta de trabalho do benchmark, fora do repositório
+nome_arquivo_resultados = "resultados.jsonl"
+
+
+# Classe para medir tempo e memória residente de uma etapa, com o amostrador
+# de memória compartilhado da instrumentação. A mesma medição pode ser usada em
+# vários blocos (um por período, por exemplo): os tempos se somam, o pico é o
+# maior entre eles e a memória inicial é a do primeiro bloco.
+class MedicaoEtapa:
+    def __init__(self, etapa):
+        self.etapa = etapa
+        self.linhas = 0
+        self.segundos = 0
+        self.pico_memoria = None
+        self.memoria_inicial = None
+
+    def __enter__(self):
+        self._memoria = MedicaoMemoria().__enter__()
+        if self.memoria_inicial is None:
+            self.memoria_inicial = self._memoria.inicial
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.segundos += time.perf_counter() - self.inicio
+        self._memoria.__exit__(*exc)
+        if self._memoria.pico is not None:
+            self.pico_memoria = max(self.pico_memoria or 0, self._memoria.pico)
+        return False
+
+    def resultado(self):
+        medido = self.memoria_inicial is not None
+        return {
+            "etapa": self.etapa,
+            "segundos": round(self.segundos, 4),
+            "linhas": self.linhas,
+            "linhas_por_segundo": (
+                round(self.linhas / self.segundos, 1) if self.segundos else None
+            ),
+            "pico_memoria_mb": (
+                round(self.pico_memoria / 2**20, 1) if medido else None
+            ),
+            "memoria_adicional_mb": (
+                round((self.pico_memoria - self.memoria_inicial) / 2**20, 1)
+                if medido
+                else None
+            ),
+        }
+
+
+# Função para identificar a versão do código medida
+def versao_codigo():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Função para apontar a configuração para destino/files, sem tocar nos dados
+# reais. A pasta é lida da variável de ambiente na primeira importação da
+# configuração, então deve ser chamada antes de importar os módulos do projeto.
+def usar_pasta_destino(destino):
+    os.environ["ANALISE_DIRETORIO_ARQUIVOS"] = os.path.join(destino, "files")
+
+
+# Função para executar as etapas da transformação e do dashboard sobre os dados
+# sintéticos em destino/files (os logs ficam em destino/execucao). Caches e
+# saídas de execuções anteriores são apagados para medir sempre a frio.
+def executar_etapas(destino, workers=1, streaming=False):
+    usar_pasta_destino(destino)
+    for pasta in ("cache", "tratado"):
+        shutil.rmtree(os.path.join(destino, "files", pasta), ignore_errors=True)
+    pasta_execucao = os.path.join(destino, "execucao")
+    os.makedirs(pasta_execucao, exist_ok=True)
+    diretorio_original = os.getcwd()
+    os.chdir(pasta_execucao)
+    try:
+        transform = importlib.import_module(".transform", __package__)
+        if transform.diretorio_arquivos != os.environ["ANALISE_DIRETORIO_ARQUIVOS"]:
+            raise RuntimeError(
+                "Configuração importada antes de definir a pasta do benchmark."
+            )
+        transform.configurar_log()
+        analise = importlib.import_module(".analise", __package__)
+        dataset_tratado = importlib.import_module(".dataset_tratado", __package__)
+        resultados = []
+
+        with MedicaoEtapa("relatorio") as medicao:
+            transform.processar_relatorio()
+        relatorio = dataset_tratado.carregar_relatorio()
+        medicao.linhas = len(relatorio)
+        resultados.append(medicao.resultado())
+
+        inicio, fim = relatorio["Data Inicial"].min(), relatorio["Data Final"].max()
+        with MedicaoEtapa("transformacao") as medicao:
+            transform.processar_arquivo_csv(
+                forcar=True, workers=workers, streaming=streaming
+            )
+        medicao.linhas = len(
+            dataset_tratado.carregar_vendas(inicio, fim, colunas=["Item"])
+        )
+        resultados.append(medicao.resultado())
+
+        # Segunda execução sem alterações: mede o custo do manifesto
+        with MedicaoEtapa("transformacao_incremental") as medicao:
+            transform.processar_arquivo_csv(workers=workers, streaming=streaming)
+        resultados.append(medicao.resultado())
+
+        with MedicaoEtapa("metricas") as medicao:
+            transform.processar_metricas_promocoes(forcar=True)
+        medicao.linhas = len(relatorio)
+        resultados.append(medicao.resultado())
+
+        # Caminho ao vivo do dashboard: carregar, correlacionar e gerar os
+        # insights de cada período do relatório. Cada passo tem a sua medição,
+        # somada entre os períodos, além do total.
+        passos = {
+            passo: MedicaoEtapa(f"dashboard_{passo}")
+            for passo in ("carregamento", "correlacao", "custos", "insights")
+        }
+        with MedicaoEtapa("dashboard_ao_vivo") as medicao:
+            prefixos = relatorio["Nome Promocao"].map(analise.obter_prefixo_periodo)
+            for prefixo, promocoes in relatorio.groupby(prefixos):
+                with passos["carregamento"]:
+                    vendas = dataset_tratado.carregar_vendas(
+                        promocoes["Data Inicial"].min(),
+                        promocoes["Data Final"].max(),
+                        skus=promocoes["SKU"].unique(),
+                    )
+                passos["carregamento"].linhas += len(vendas)
+                medicao.linhas += len(vendas)
+                if vendas.empty:
+                    continue
+                with passos["correlacao"]:
+                    correlacionados = analise.correlacionar_vendas(promocoes, vendas)
+                passos["correlacao"].linhas += len(correlacionados)
+                with passos["custos"]:
+                    custo_encarte = analise.calcular_custos_encarte(
+                        correlacionados, promocoes["Nome Promocao"].iloc[0]
+                    )
+                passos["custos"].linhas += len(correlacionados)
+                with passos["insights"]:
+                    analise.gerar_insights(correlacionados, custo_encarte)
+                passos["insights"].linhas += len(correlacionados)
+        resultados += [passo.resultado() for passo in passos.values()]
+        resultados.append(medicao.resultado())
+        return resultados
+    finally:
+        os.chdir(diretorio_original)
+
+
+# Função para gravar os resultados de uma execução no histórico
+def salvar_resultados(arquivo_resultados, registros):
+    os.makedirs(os.path.dirname(arquivo_resultados) or ".", exist_ok=True)
+    with open(arquivo_resultados, "a", encoding="utf-8") as arquivo:
+        for registro in registros:
+            arquivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+
+# Função para comparar a última execução de cada escala com a anterior
+def comparar_resultados(arquivo_resultados):
+    if not os.path.exists(arquivo_resultados):
+        print("Nenhum resultado salvo para comparar.")
+        return
+    with open(arquivo_resultados, encoding="utf-8") as arquivo:
+        registros = [json.loads(linha) for linha in arquivo if linha.strip()]
+
+    execucoes = {}
+    for registro in registros:
+        chave = (registro["escala"], registro["modo"])
+        execucoes.setdefault(chave, {}).setdefault(registro["execucao"], {})[
+            registro["etapa"]
+        ] = registro
+
+    for (escala, modo), por_execucao in sorted(execucoes.items()):
+        ordem = sorted(por_execucao)
+        atual = por_execucao[ordem[-1]]
+        anterior = por_execucao[ordem[-2]] if len(ordem) > 1 else {}
+        print(f"\nEscala {escala}x ({modo}) - execução {ordem[-1]}")
+        print(
+            f"{'Etapa':<28}{'Segundos':>10}{'Anterior':>10}{'Variação':>10}"
+            f"{'Linhas/s':>12}{'Pico MB':>10}"
+        )
+        for etapa, registro in atual.items():
+            segundos = registro["segundos"]
+            segundos_anteriores = anterior.get(etapa, {}).get("segundos")
+            variacao = (
+                f"{(segundos / segundos_anteriores - 1) * 100:+.1f}%"
+                if segundos_anteriores
+                else "-"
+            )
+            print(
+                f"{etapa:<28}{segundos:>10.2f}"
+                f"{f'{segundos_anteriores:.2f}' if segundos_anteriores else '-':>10}"
+                f"{variacao:>10}{registro['linhas_por_segundo'] or '-':>12}"
+                f"{registro['pico_memoria_mb'] or '-':>10}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark da transformação e do dashboard com dados sintéticos."
+    )
+    parser.add_argument(
+        "destino", help="Pasta de trabalho onde os dados sintéticos serão gerados."
+    )
+    parser.add_argument(
+        "--escala", type=float, default=1, help="Multiplicador do volume (1 a 100)."
+    )
+    parser.add_argument(
+        "--anos", type=int, default=1, help="Quantidade de anos, a partir de 2024."
+    )
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--streaming", action="store_true")
+    parser.add_argument(
+        "--resultados",
+        help="Arquivo JSON lines onde os resultados são acumulados "
+        f"(padrão: destino/{nome_arquivo_resultados}).",
+    )
+    parser.add_argument(
+        "--reaproveitar",
+        action="store_true",
+        help="Usa os dados já gerados em destino, sem gerar novamente.",
+    )
+    parser.add_argument(
+        "--comparar",
+        action="store_true",
+        help="Apenas compara as execuções salvas, sem executar o benchmark.",
+    )
+    args = parser.parse_args()
+    arquivo_resultados = os.path.abspath(
+        args.resultados or os.path.join(args.destino, nome_arquivo_resultados)
+    )
+
+    if args.comparar:
+        comparar_resultados(arquivo_resultados)
+        sys.exit(0)
+
+    destino = os.path.abspath(args.destino)
+    usar_pasta_destino(destino)
+    from .gerador_dados import gerar_dados, meses_dos_anos
+
+    resultados = []
+    if not args.reaproveitar:
+        with MedicaoEtapa("geracao") as medicao:
+            linhas = gerar_dados(
+                destino, escala=args.escala, meses=meses_dos_anos(args.anos)
+            )
+        medicao.linhas = linhas["excel"]
+        resultados.append(medicao.resultado())
+    resultados += executar_etapas(destino, args.workers, args.streaming)
+
+    execucao = datetime.now().isoformat(timespec="seconds")
+    modo = "streaming" if args.streaming else "memoria"
+    modo += f"-{args.workers}w"
+    if args.anos > 1:
+        modo += f"-{args.anos}anos"
+    comum = {
+        "execucao": execucao,
+        "versao": versao_codigo(),
+        "escala": args.escala,
+        "modo": modo,
+    }
+    salvar_resultados(arquivo_resultados, [comum | r for r in resultados])
+    comparar_resultados(arquivo_resultados)
@@ -0,0 +1,82 @@
+import hashlib
+import os
+import pickle
+from .config.config_interface import (
+    diretorio_cache_resultados,
+    tamanho_maximo_cache_resultados,
+)
+from .config.config_transform import tipos_arrow
+
+
+# Função para transformar as partes da chave em um nome de arquivo estável
+def gerar_chave(*partes):
+    return hashlib.sha256(repr(partes).encode("utf-8")).hexdigest()
+
+
+# Função para montar o caminho de uma entrada do cache
+def arquivo_entrada(chave):
+    return os.path.join(diretorio_cache_resultados, f"{chave}.pkl")
+
+
+# Função para ler uma entrada do cache, marcando-a como usada recentemente
+def ler_cache(chave):
+    caminho = arquivo_entrada(chave)
+    try:
+        with open(caminho, "rb") as arquivo:
+            valor = pickle.load(arquivo)
+    except FileNotFoundError:
+        return False, None
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError):
+        # Entrada corrompida ou de uma versão antiga do código: descartar
+        remover_entrada(caminho)
+        return False, None
+    os.utime(caminho)
+    return True, valor
+
+
+# Função para gravar uma entrada do cache e respeitar o tamanho máximo
+def gravar_cache(chave, valor):
+    os.makedirs(diretorio_cache_resultados, exist_ok=True)
+    caminho = arquivo_entrada(chave)
+    arquivo_temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(arquivo_temporario, "wb") as arquivo:
+        pickle.dump(valor, arquivo, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(arquivo_temporario, caminho)
+    limitar_cache()
+
+
+# Função para remover um arquivo do cache ignorando concorrência
+def remover_entrada(caminho):
+    try:
+        os.remove(caminho)
+    except FileNotFoundError:
+        pass
+
+
+# Função para remover as entradas menos usadas até caber no tamanho máximo
+def limitar_cache():
+    entradas = []
+    with os.scandir(diretorio_cache_resultados) as itens:
+        for item in itens:
+            if item.name.endswith(".pkl"):
+                info = item.stat()
+                entradas.append((info.st_mtime_ns, info.st_size, item.path))
+
+    total = sum(tamanho for _, tamanho, _ in entradas)
+    for _, tamanho, caminho in sorted(entradas):
+        if total <= tamanho_maximo_cache_resultados:
+            break
+        remover_entrada(caminho)
+        total -= tamanho
+
+
+# Função para devolver o resultado em cache ou calculá-lo e guardá-lo. O modo
+# Arrow muda os tipos dos DataFrames guardados, então entra em todas as chaves.
+def obter_ou_calcular(partes_chave, calcular):
+    chave = gerar_chave(*partes_chave, ("tipos_arrow", tipos_arrow))
+    encontrado, valor = ler_cache(chave)
+    if encontrado:
+        return valor
+    valor = calcular()
+    gravar_cache(chave, valor)
+    return valor
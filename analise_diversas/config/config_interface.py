@@ -0,0 +1,60 @@
+import os
+from .config_transform import diretorio_arquivos
+
+# Definir caminhos do cache de resultados do dashboard
+diretorio_cache_resultados = os.path.join(diretorio_arquivos, "cache", "resultados")
+
+# Tamanho máximo do cache em disco (bytes); as entradas menos usadas saem primeiro
+tamanho_maximo_cache_resultados = 512 * 1024 * 1024
+
+# Tabelas do dashboard: opções de linhas por página (a primeira é o padrão) e
+# colunas do detalhamento das vendas correlacionadas
+tamanhos_pagina = [50, 100, 250, 500]
+colunas_vendas_correlacionadas = [
+    "Nome Promocao",
+    "SKU",
+    "Nome Item",
+    "Loja",
+    "Data",
+    "Quantidade",
+    "Valor Vendido",
+    "Preco Vendido",
+    "Preco Promocao",
+    "Desconto Aplicado",
+    "Lucro Bruto",
+]
+
+# Códigos da coluna Promoção cujas vendas ficam fora da análise: o dashboard
+# local descarta "P" e o interface2 descarta também "R"
+codigos_promocao_excluidos = ["P"]
+codigos_promocao_excluidos_remoto = ["P", "R"]
+
+# Custo de impressão do encarte a cada duas semanas (ver dados.txt)
+custo_encarte_modelo_unico = 3600
+custo_encarte_multiplos_modelos = 6400
+
+# Endereços dos arquivos tratados publicados (usados pelo interface2). O
+# relatório é lido do Parquet e, enquanto ele não estiver publicado, do CSV
+url_base_remota = "https://grupovivenci.com.br/"
+url_relatorio_remoto = url_base_remota + "relatorio_tratado.parquet"
+url_relatorio_remoto_csv = url_base_remota + "relatorio_tratado.csv"
+url_tratado_remoto = url_base_remota + "tratado/"
+
+# Cache local das respostas HTTP (validado com ETag / Last-Modified)
+diretorio_cache_remoto = os.path.join(diretorio_arquivos, "cache", "remoto")
+# Quantidade de downloads simultâneos e tempo limite (segundos) por requisição
+conexoes_remotas = 6
+tempo_limite_remoto = 30
+
+# Leitura parcial de Parquet remoto com HTTP Range: tamanho de cada bloco
+# baixado (bytes) e quantidade máxima de blocos mantidos em memória
+tamanho_bloco_remoto = 256 * 1024
+blocos_remotos_em_cache = 256
+
+# Consultas SQL sobre files/tratado (DuckDB): motor usado pelo dashboard para
+# carregar as vendas das promoções ("arrow" ou "duckdb"), threads (None = todos
+# os núcleos), limite de memória e pasta usada quando a consulta não cabe nele
+motor_consultas = "arrow"
+threads_consulta = None
+limite_memoria_consulta = "2GB"
+diretorio_temporario_consulta = os.path.join(diretorio_arquivos, "cache", "duckdb")
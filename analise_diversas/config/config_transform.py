@@ -1,13 +1,49 @@
 import os
 
-# Definir caminhos dos arquivos e diretórios
-caminho_arquivos_csv = "../files/2024/desconto"
-caminho_arquivos_xlsx = "../files/2024/cupons"
-caminho_relatorio = "../files/2024/relatorios/rel_2024.csv"
-diretorio_saida = "../files/tratado"
 
-# Garantir que o diretório de saída exista
-os.makedirs(diretorio_saida, exist_ok=True)
+# Pasta com os arquivos de entrada (uma subpasta por ano), os tratados e os
+# caches. Pode ser trocada pela variável de ambiente ANALISE_DIRETORIO_ARQUIVOS.
+# O padrão é a pasta files do projeto quando o código roda do checkout (com o
+# pyproject.toml), qualquer que seja a pasta de execução; instalado como pacote,
+# é a pasta files dentro da pasta de execução.
+def diretorio_arquivos_padrao():
+    raiz_projeto = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+    if os.path.exists(os.path.join(raiz_projeto, "pyproject.toml")):
+        return os.path.join(raiz_projeto, "files")
+    return os.path.join(os.getcwd(), "files")
+
+
+diretorio_arquivos = os.path.abspath(
+    os.environ.get("ANALISE_DIRETORIO_ARQUIVOS") or diretorio_arquivos_padrao()
+)
+
+# Subpastas de cada ano: AAAA/desconto/*.csv, AAAA/cupons/CUPOM_AAAA-MM.xlsx e
+# AAAA/relatorios/*.csv
+pasta_descontos = "desconto"
+pasta_cupons = "cupons"
+pasta_relatorios = "relatorios"
+
+diretorio_saida = os.path.join(diretorio_arquivos, "tratado")
+arquivo_manifesto = os.path.join(diretorio_saida, "manifesto.json")
+diretorio_dataset = os.path.join(diretorio_saida, "dataset")
+
+# Formatos dos arquivos de saída ("parquet" e/ou "csv"; o CSV é opcional)
+formatos_saida = ["parquet"]
+# Codec de compressão dos arquivos Parquet ("snappy", "zstd", "gzip" ou None)
+compressao_parquet = "zstd"
+diretorio_cache_cupons = os.path.join(diretorio_arquivos, "cache", "cupons")
+diretorio_particoes_descontos = os.path.join(diretorio_arquivos, "cache", "descontos")
+
+# Quantidade de linhas do CSV de descontos lidas por bloco no modo streaming
+tamanho_bloco_csv = 1_000_000
+
+# Chave inteira do cupom usada no merge descontos x cupons: bits reservados para
+# cada campo (63 no total, cabe em int64). Valores fora desses limites fazem o
+# mês voltar ao merge pelas quatro colunas.
+bits_chave_cupom = {"documento": 32, "caixa": 8, "loja": 8, "dia": 15}
+data_base_chave_cupom = "2000-01-01"
+# Merge por ordenação da chave (searchsorted) em vez do merge por hash do pandas
+merge_ordenado = False
 
 # Definir colunas e tipos de dados para o CSV
 colunas_csv = [
@@ -21,12 +57,21 @@ colunas_csv = [
     "Cliente",
     "Operador",
 ]
+# Modo Arrow: os textos ficam em buffers do pyarrow (string[pyarrow]) desde a
+# leitura dos arquivos até o dashboard, em vez de arrays de objetos do NumPy.
+# Números, datas e categorias mantêm os tipos atuais.
+tipos_arrow = False
+tipo_texto = "string[pyarrow]" if tipos_arrow else "string"
+
+# Chaves do merge como inteiros pequenos e campos de baixa cardinalidade como
+# categorias. As chaves aceitam nulos (Int16/Int64), para que uma linha com a
+# chave em branco não interrompa a leitura; os valores monetários ficam em
+# float64, como nos arquivos publicados.
 tipo_dados_csv = {
-    "Lj": "category",
-    "Data": "string",
-    "Hora": "string",
-    "Docum": "category",
-    "CX": "category",
+    "Lj": "Int16",
+    "Data": tipo_texto,
+    "Docum": "Int64",
+    "CX": "Int16",
     "Valor": "float64",
     "Desconto": "float64",
     "Tipo": "category",
@@ -34,11 +79,11 @@ tipo_dados_csv = {
     "Operador": "category",
 }
 tipo_dados_relatorio = {
-    "Descricao": "string",
-    "Dt.Valid.Ini": "string",
-    "Dt.Valid.Fin": "string",
-    "Item": "string",
-    "Descricao.1": "string",
+    "Descricao": tipo_texto,
+    "Dt.Valid.Ini": tipo_texto,
+    "Dt.Valid.Fin": tipo_texto,
+    "Item": tipo_texto,
+    "Descricao.1": tipo_texto,
     "Pr.Un": "float64",
     "Quant.": "float64",
     "Pr.Total": "float64",
@@ -58,6 +103,48 @@ colunas_excel = [
     "Promoção",
 ]
 
+# Tipos das colunas do Excel no cache colunar (Parquet) dos cupons
+tipo_dados_excel_cache = {
+    "Loja": "int16",
+    "Num.Cupom": "int64",
+    "Data": "timestamp[ns]",
+    "PDV": "int16",
+    "Item": "int64",
+    "Desc.Item": "string",
+    "Quantidade": "float64",
+    "Pr.Venda.Un": "float64",
+    "Pr.Venda Total": "float64",
+    "Promoção": "string",
+}
+# Tipos das colunas do Excel após a leitura do cache (chaves do merge também
+# aceitando nulos)
+tipo_dados_excel = {
+    "Loja": "Int16",
+    "Num.Cupom": "Int64",
+    "Data": "datetime64[ns]",
+    "PDV": "Int16",
+    "Item": "int64",
+    "Desc.Item": tipo_texto if tipos_arrow else "object",
+    "Quantidade": "float64",
+    "Pr.Venda.Un": "float64",
+    "Pr.Venda Total": "float64",
+    "Promoção": "category",
+}
+# Chaves do merge formatadas como texto nos arquivos de saída
+# (coluna: quantidade de dígitos preenchidos com zeros à esquerda)
+formato_chaves_saida = {
+    "Lj": 2,
+    "Docum": 0,
+    "CX": 0,
+    "Loja": 2,
+    "Num.Cupom": 0,
+    "PDV": 0,
+}
+# Quantidade de linhas por row group no dataset particionado (ano_mes/Loja)
+tamanho_grupo_linhas = 50_000
+# Quantidade de linhas lidas do Excel por lote ao gerar o cache
+tamanho_lote_excel = 50_000
+
 colunas_relatorio = [
     "Descricao",
     "Dt.Valid.Ini",
@@ -77,4 +164,9 @@ colunas_finais_relatorio = [
     "Preco Vendido",
     "Preco Promocao",
     "Ativacao",
+    # Partes do nome da promoção, calculadas uma vez no processamento
+    "Prefixo Periodo",
+    "Modelo Encarte",
+    "Inicio Periodo",
+    "Fim Periodo",
 ]
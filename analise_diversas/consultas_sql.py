@@ -0,0 +1,171 @@
+import argparse
+import glob
+import os
+import sys
+
+from .config.config_transform import diretorio_dataset, diretorio_saida
+from .config.config_interface import (
+    threads_consulta,
+    limite_memoria_consulta,
+    diretorio_temporario_consulta,
+)
+
+
+# Função para escrever um caminho como literal de texto do SQL
+def literal_sql(caminho):
+    return "'" + os.path.abspath(caminho).replace("'", "''") + "'"
+
+
+# Função para registrar os arquivos de files/tratado como views: o dataset
+# particionado (ano_mes/Loja) forma a tabela "vendas", gravado em qualquer
+# formato de saída, e o relatório tratado a tabela "relatorio" (com o SKU
+# também como inteiro, na coluna Item, para juntar com as vendas). As métricas
+# e o ranking gerados pelo transform entram quando existirem.
+def registrar_tabelas(conexao):
+    # Só as pastas de meses completos (um mês em gravação fica em ano_mes=...tmp)
+    padrao_dataset = os.path.join(
+        diretorio_dataset, "ano_mes=????-??", "**", "*.parquet"
+    )
+    tabelas = []
+    if glob.glob(padrao_dataset, recursive=True):
+        conexao.execute(
+            f"CREATE OR REPLACE VIEW vendas AS "
+            f"SELECT * FROM read_parquet({literal_sql(padrao_dataset)}, "
+            f"hive_partitioning = true, "
+            f"hive_types = {{'ano_mes': 'VARCHAR', 'Loja': 'VARCHAR'}}, "
+            f"union_by_name = true)"
+        )
+        tabelas.append("vendas")
+
+    arquivo_relatorio = os.path.join(diretorio_saida, "relatorio_tratado.parquet")
+    if os.path.exists(arquivo_relatorio):
+        leitura = f"read_parquet({literal_sql(arquivo_relatorio)})"
+    else:
+        arquivo_relatorio = os.path.join(diretorio_saida, "relatorio_tratado.csv")
+        leitura = (
+            f"read_csv({literal_sql(arquivo_relatorio)}, delim = ';', header = true, "
+            f"types = {{'SKU': 'VARCHAR'}})"
+        )
+    if os.path.exists(arquivo_relatorio):
+        conexao.execute(
+            f"CREATE OR REPLACE VIEW relatorio AS SELECT *, "
+            f"TRY_CAST(trim(SKU) AS BIGINT) AS Item FROM {leitura}"
+        )
+        tabelas.append("relatorio")
+
+    for nome in (
+        "metricas_promocoes",
+        "metricas_promocoes_sku",
+        "metricas_promocoes_loja",
+        "ranking_promocoes",
+    ):
+        arquivo = os.path.join(diretorio_saida, f"{nome}.parquet")
+        if os.path.exists(arquivo):
+            conexao.execute(
+                f"CREATE OR REPLACE VIEW {nome} AS "
+                f"SELECT * FROM read_parquet({literal_sql(arquivo)})"
+            )
+            tabelas.append(nome)
+    return tabelas
+
+
+# Função para abrir uma conexão DuckDB em memória com as tabelas registradas.
+# As consultas usam várias threads e gravam em disco o que passar do limite
+# de memória, então podem varrer todos os meses sem carregá-los no pandas.
+def conectar():
+    import duckdb
+
+    conexao = duckdb.connect()
+    if threads_consulta:
+        conexao.execute(f"SET threads = {int(threads_consulta)}")
+    if limite_memoria_consulta:
+        conexao.execute(f"SET memory_limit = '{limite_memoria_consulta}'")
+    os.makedirs(diretorio_temporario_consulta, exist_ok=True)
+    conexao.execute(
+        f"SET temp_directory = {literal_sql(diretorio_temporario_consulta)}"
+    )
+    registrar_tabelas(conexao)
+    return conexao
+
+
+# Função para executar uma consulta SQL e devolver o resultado como DataFrame
+def consultar(sql, parametros=None):
+    with conectar() as conexao:
+        return conexao.execute(sql, parametros).df()
+
+
+# Função para carregar as vendas que caem na validade de alguma das promoções
+# (mesmo SKU e data dentro do período), usada pelo dashboard com o motor "duckdb"
+def carregar_vendas_promocoes(promocoes, colunas=None):
+    janelas = (
+        promocoes.assign(Item=lambda df: df["SKU"].astype(str).str.strip())
+        .assign(Item=lambda df: df["Item"].where(df["Item"].str.isdigit()))
+        .dropna(subset=["Item"])
+        .astype({"Item": "int64"})[["Item", "Data Inicial", "Data Final"]]
+        .drop_duplicates()
+    )
+    selecao = ", ".join(f'v."{coluna}"' for coluna in colunas) if colunas else "v.*"
+    with conectar() as conexao:
+        conexao.register("janelas", janelas)
+        return conexao.execute(f"""
+            SELECT {selecao}
+            FROM vendas v
+            WHERE EXISTS (
+                SELECT 1 FROM janelas j
+                WHERE j.Item = v.Item
+                  AND v.Data BETWEEN j."Data Inicial" AND j."Data Final"
+            )
+            """).df()
+
+
+# Ponto de entrada da linha de comando
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(
+        description="Consulta SQL (DuckDB) sobre os arquivos de files/tratado."
+    )
+    parser.add_argument(
+        "sql",
+        nargs="?",
+        help="Consulta SQL; tabelas: vendas, relatorio, metricas_promocoes, "
+        "metricas_promocoes_sku, metricas_promocoes_loja e ranking_promocoes.",
+    )
+    parser.add_argument(
+        "--tabelas", action="store_true", help="Lista as tabelas e suas colunas."
+    )
+    parser.add_argument("--formato", choices=["texto", "json", "csv"], default="texto")
+    parser.add_argument(
+        "--saida", help="Arquivo .csv ou .parquet onde o resultado será salvo."
+    )
+    args = parser.parse_args(argumentos)
+
+    if args.tabelas:
+        with conectar() as conexao:
+            for (nome,) in conexao.execute(
+                "SELECT view_name FROM duckdb_views() WHERE NOT internal"
+            ).fetchall():
+                descricao = conexao.execute(f"DESCRIBE {nome}").fetchall()
+                print(nome)
+                for coluna, tipo, *_ in descricao:
+                    print(f"  {coluna:<24}{tipo}")
+        return 0
+    if not args.sql:
+        parser.error("informe a consulta SQL ou --tabelas")
+
+    resultado = consultar(args.sql)
+    if args.saida is not None:
+        if args.saida.endswith(".parquet"):
+            resultado.to_parquet(args.saida, index=False)
+        else:
+            resultado.to_csv(args.saida, index=False, encoding="utf-8", sep=";")
+        print(f"{len(resultado)} linhas salvas em {args.saida}.")
+    elif args.formato == "json":
+        print(resultado.to_json(orient="records", date_format="iso", force_ascii=False))
+    elif args.formato == "csv":
+        print(resultado.to_csv(index=False, sep=";"), end="")
+    else:
+        print(resultado.to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
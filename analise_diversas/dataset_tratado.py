@@ -0,0 +1,230 @@
+import os
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from .analise import como_texto, estruturar_promocoes
+from .config.config_transform import (
+    diretorio_saida,
+    diretorio_dataset,
+    tamanho_grupo_linhas,
+    compressao_parquet,
+    tipos_arrow,
+)
+
+# Partições do dataset tratado: files/tratado/dataset/ano_mes=AAAA-MM/Loja=NN/
+esquema_particoes = pa.schema([("ano_mes", pa.string()), ("Loja", pa.string())])
+
+
+# Função para converter uma tabela do pyarrow em DataFrame. Com tipos_arrow, as
+# colunas de texto passam para string[pyarrow] sem cópia para objetos Python.
+def para_pandas(tabela):
+    if not tipos_arrow:
+        return tabela.to_pandas()
+    texto = pd.StringDtype("pyarrow")
+    return tabela.to_pandas(
+        types_mapper={pa.string(): texto, pa.large_string(): texto}.get
+    )
+
+
+# Função para montar o diretório de um mês no dataset
+def diretorio_mes_dataset(ano_mes):
+    return os.path.join(diretorio_dataset, f"ano_mes={ano_mes}")
+
+
+# Função para gravar um mês no dataset, particionado por loja e ordenado por item
+def gravar_mes_dataset(df, ano_mes):
+    diretorio_mes = diretorio_mes_dataset(ano_mes)
+    diretorio_temporario = f"{diretorio_mes}.tmp"
+    shutil.rmtree(diretorio_temporario, ignore_errors=True)
+    os.makedirs(diretorio_temporario)
+
+    for loja, df_loja in df.groupby("Loja", sort=True, observed=True):
+        # Ordenar por item deixa as estatísticas dos row groups seletivas por SKU
+        df_loja = df_loja.drop(columns=["Loja"]).sort_values("Item", kind="stable")
+        diretorio_loja = os.path.join(diretorio_temporario, f"Loja={loja}")
+        os.makedirs(diretorio_loja)
+        pq.write_table(
+            pa.Table.from_pandas(df_loja, preserve_index=False),
+            os.path.join(diretorio_loja, "parte-0.parquet"),
+            row_group_size=tamanho_grupo_linhas,
+            write_statistics=True,
+            compression=compressao_parquet,
+        )
+
+    # Substituir o mês inteiro de uma vez, sem deixar partições antigas
+    shutil.rmtree(diretorio_mes, ignore_errors=True)
+    os.replace(diretorio_temporario, diretorio_mes)
+
+
+# Função para ler um relatório de promoções tratado no formato indicado
+# ("parquet" ou "csv"), de um caminho ou de um arquivo já em memória
+def ler_relatorio(origem, formato, colunas=None):
+    if formato == "parquet":
+        relatorio = para_pandas(pq.read_table(origem, columns=colunas))
+    else:
+        relatorio = pd.read_csv(
+            origem,
+            sep=";",
+            usecols=colunas,
+            dtype={"SKU": str},
+            parse_dates=[
+                c
+                for c in ("Data Inicial", "Data Final")
+                if colunas is None or c in colunas
+            ],
+        )
+        # Limites do período, ausentes nos relatórios gravados antes deles
+        for coluna in ("Inicio Periodo", "Fim Periodo"):
+            if coluna in relatorio.columns:
+                relatorio[coluna] = pd.to_datetime(relatorio[coluna])
+
+    # SKUs numéricos sem zeros à esquerda, no mesmo formato do Item das vendas
+    if "SKU" in relatorio.columns:
+        relatorio["SKU"] = (
+            como_texto(relatorio["SKU"])
+            .str.strip()
+            .str.replace(r"^0+(\d)", r"\1", regex=True)
+        )
+
+    # Relatórios gravados antes das colunas estruturadas
+    if (
+        colunas is None
+        and "Prefixo Periodo" not in relatorio.columns
+        and {"Nome Promocao", "Data Inicial", "Data Final"} <= set(relatorio.columns)
+    ):
+        relatorio = estruturar_promocoes(relatorio)
+    for coluna in ("Prefixo Periodo", "Modelo Encarte"):
+        if coluna in relatorio.columns:
+            relatorio[coluna] = relatorio[coluna].astype("category")
+    return relatorio
+
+
+# Função para carregar o relatório de promoções tratado, preferindo o Parquet
+def carregar_relatorio(colunas=None):
+    arquivo_parquet = os.path.join(diretorio_saida, "relatorio_tratado.parquet")
+    if os.path.exists(arquivo_parquet):
+        return ler_relatorio(arquivo_parquet, "parquet", colunas)
+    return ler_relatorio(
+        os.path.join(diretorio_saida, "relatorio_tratado.csv"), "csv", colunas
+    )
+
+
+# Função para montar o caminho de uma tabela de métricas pré-calculadas
+def arquivo_metricas(nivel):
+    sufixo = f"_{nivel}" if nivel else ""
+    return os.path.join(diretorio_saida, f"metricas_promocoes{sufixo}.parquet")
+
+
+# Função para montar o caminho do ranking de rentabilidade dos períodos
+def arquivo_ranking(formato):
+    return os.path.join(diretorio_saida, f"ranking_promocoes.{formato}")
+
+
+# Função para carregar as métricas por promoção, apenas se foram geradas depois
+# da última alteração dos dados tratados do intervalo (nunca serve dado antigo)
+def carregar_metricas_promocoes(data_inicial, data_final, nivel=None):
+    arquivo = arquivo_metricas(nivel)
+    if not os.path.exists(arquivo):
+        return None
+    gerado_em = os.stat(arquivo).st_mtime_ns
+    versao = versao_dados(data_inicial, data_final)
+    if any(mtime > gerado_em for _, _, mtime in versao):
+        return None
+    return pd.read_parquet(arquivo)
+
+
+# Função para listar tamanho e mtime dos arquivos de uma pasta ou arquivo
+def versao_caminho(caminho):
+    if os.path.isfile(caminho):
+        info = os.stat(caminho)
+        return [(caminho, info.st_size, info.st_mtime_ns)]
+    versao = []
+    for raiz, _, arquivos in os.walk(caminho):
+        for nome in sorted(arquivos):
+            info = os.stat(os.path.join(raiz, nome))
+            versao.append((os.path.join(raiz, nome), info.st_size, info.st_mtime_ns))
+    return sorted(versao)
+
+
+# Função para identificar a versão do relatório tratado (tamanho e mtime)
+def versao_relatorio():
+    return [
+        versao
+        for formato in ("parquet", "csv")
+        for versao in versao_caminho(
+            os.path.join(diretorio_saida, f"relatorio_tratado.{formato}")
+        )
+    ]
+
+
+# Função para identificar a versão dos dados tratados de um intervalo de datas
+def versao_dados(data_inicial, data_final):
+    versao = versao_relatorio()
+    for mes in meses_do_intervalo(data_inicial, data_final):
+        versao += versao_caminho(diretorio_mes_dataset(mes))
+        versao += versao_caminho(
+            os.path.join(diretorio_saida, f"{mes}_tratado.parquet")
+        )
+    return versao
+
+
+# Função para listar os meses (AAAA-MM) que cobrem um intervalo de datas
+def meses_do_intervalo(data_inicial, data_final):
+    return list(
+        pd.period_range(
+            start=pd.Timestamp(data_inicial), end=pd.Timestamp(data_final), freq="M"
+        ).strftime("%Y-%m")
+    )
+
+
+# Função para montar o filtro de lojas e SKUs usado nas leituras
+def montar_filtro(lojas=None, skus=None):
+    filtro = None
+    if lojas is not None:
+        filtro = ds.field("Loja").isin([str(loja).zfill(2) for loja in lojas])
+    if skus is not None:
+        itens = sorted({int(sku) for sku in skus if str(sku).strip().isdigit()})
+        filtro_itens = ds.field("Item").isin(itens)
+        filtro = filtro_itens if filtro is None else filtro & filtro_itens
+    return filtro
+
+
+# Função para carregar vendas tratadas lendo apenas as partições e row groups
+# necessários para o intervalo, lojas, SKUs e colunas pedidos
+def carregar_vendas(data_inicial, data_final, lojas=None, skus=None, colunas=None):
+    meses = meses_do_intervalo(data_inicial, data_final)
+    filtro = montar_filtro(lojas, skus)
+
+    meses_dataset = [mes for mes in meses if os.path.isdir(diretorio_mes_dataset(mes))]
+    tabelas = []
+    if meses_dataset:
+        dataset = ds.dataset(
+            diretorio_dataset,
+            format="parquet",
+            partitioning=ds.partitioning(esquema_particoes, flavor="hive"),
+            exclude_invalid_files=True,
+        )
+        filtro_meses = ds.field("ano_mes").isin(meses_dataset)
+        filtro_dataset = filtro_meses if filtro is None else filtro_meses & filtro
+        tabela = dataset.to_table(columns=colunas, filter=filtro_dataset)
+        if colunas is None:
+            tabela = tabela.drop_columns(["ano_mes"])
+        tabelas.append(para_pandas(tabela))
+
+    # Meses ainda sem partição no dataset são lidos do arquivo mensal plano
+    for mes in meses:
+        if mes in meses_dataset:
+            continue
+        arquivo_mensal = os.path.join(diretorio_saida, f"{mes}_tratado.parquet")
+        if os.path.exists(arquivo_mensal):
+            tabelas.append(
+                para_pandas(
+                    pq.read_table(arquivo_mensal, columns=colunas, filters=filtro)
+                )
+            )
+
+    if tabelas:
+        return pd.concat(tabelas, ignore_index=True)
+    return pd.DataFrame()
@@ -0,0 +1,213 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from .config.config_transform import colunas_csv, colunas_excel, colunas_relatorio
+
+# Volume da escala 1x; as demais escalas multiplicam os cupons por mês
+cupons_por_mes_base = 2_000
+meses_padrao = ["2024-07", "2024-08", "2024-09"]
+lojas_padrao = [1, 2, 3, 4, 5]
+modelos_encarte = ["EF", "CA", "DV1", "AJ", "DV2"]
+quantidade_skus = 2_000
+skus_por_tabloide = 60
+tipos_pagamento = ["DINHEIRO", "PIX", "BRASIL CARD CREDITO", "DEBITO", "CREDITO"]
+operadores = ["ANA", "BIA", "CARLOS", "DANI", "EDU", "FRANCIELE", "GUI", "HELO"]
+
+
+# Função para formatar números com vírgula decimal, como nas exportações
+def formatar_decimal(valores):
+    return pd.Series(np.round(valores, 2)).map(lambda v: f"{v:.2f}".replace(".", ","))
+
+
+# Função para gerar os cupons de um mês (lado do CSV de descontos e do Excel)
+def gerar_cupons_mes(ano_mes, quantidade_cupons, gerador, precos):
+    inicio = pd.Timestamp(f"{ano_mes}-01")
+    dias = gerador.integers(0, inicio.days_in_month, quantidade_cupons)
+    datas = inicio + pd.to_timedelta(dias, unit="D")
+    ordem = np.argsort(dias, kind="stable")
+    cupons = pd.DataFrame(
+        {
+            "Loja": gerador.choice(lojas_padrao, quantidade_cupons),
+            "Num.Cupom": 100_000 * int(ano_mes[-2:]) + np.arange(quantidade_cupons),
+            "Data": datas,
+            "PDV": gerador.integers(1, 31, quantidade_cupons),
+        }
+    ).iloc[ordem]
+
+    # Itens de cada cupom (1 a 8 por cupom)
+    itens_por_cupom = gerador.integers(1, 9, quantidade_cupons)
+    itens = cupons.loc[cupons.index.repeat(itens_por_cupom[cupons.index])]
+    skus = gerador.integers(0, quantidade_skus, len(itens))
+    quantidades = np.where(
+        gerador.random(len(itens)) < 0.2,
+        np.round(gerador.uniform(0.1, 3, len(itens)), 3),
+        gerador.integers(1, 7, len(itens)),
+    )
+    precos_unitarios = precos[skus]
+    itens = itens.assign(
+        **{
+            "Item": skus + 1,
+            "Desc.Item": [f"PRODUTO {sku + 1:06d}" for sku in skus],
+            "Quantidade": quantidades,
+            "Pr.Venda.Un": precos_unitarios,
+            "Pr.Venda Total": np.round(precos_unitarios * quantidades, 2),
+            "Promoção": gerador.choice(["", "", "", "P", "R", "N"], len(itens)),
+        }
+    )
+
+    # Lado dos descontos: um registro por cupom
+    descontos = pd.DataFrame(
+        {
+            "Lj": cupons["Loja"].to_numpy(),
+            "Data": cupons["Data"].dt.strftime("%d/%m/%Y").to_numpy(),
+            "Docum": cupons["Num.Cupom"].to_numpy(),
+            "CX": cupons["PDV"].to_numpy(),
+            "Valor": formatar_decimal(gerador.uniform(5, 800, len(cupons))).to_numpy(),
+            "Desconto": formatar_decimal(
+                gerador.uniform(0, 20, len(cupons))
+            ).to_numpy(),
+            "Tipo": gerador.choice(tipos_pagamento, len(cupons)),
+            "Cliente": gerador.choice(["CONSUMIDOR FINAL", "CLIENTE APP"], len(cupons)),
+            "Operador": gerador.choice(operadores, len(cupons)),
+        }
+    )
+    return descontos[colunas_csv], itens[colunas_excel]
+
+
+# Função para gravar um Excel de cupons em modo streaming (write_only)
+def gravar_excel_cupons(itens, caminho):
+    pasta = Workbook(write_only=True)
+    planilha = pasta.create_sheet()
+    planilha.append(colunas_excel)
+    datas = itens["Data"].dt.strftime("%d/%m/%y").to_numpy()
+    valores = itens.drop(columns=["Data"]).to_numpy(dtype=object)
+    indice_data = colunas_excel.index("Data")
+    for data, linha in zip(datas, valores):
+        linha = list(linha)
+        linha.insert(indice_data, data)
+        planilha.append(linha)
+    pasta.save(caminho)
+
+
+# Função para gerar o relatório de promoções: dois tabloides por mês, cada
+# um com um modelo de encarte por loja
+def gerar_relatorio(meses, gerador, precos):
+    linhas = []
+    for ano_mes in meses:
+        inicio = pd.Timestamp(f"{ano_mes}-01")
+        for dia_inicial in (1, 15):
+            data_inicial = inicio + pd.Timedelta(days=dia_inicial - 1)
+            data_final = data_inicial + pd.Timedelta(days=12)
+            # Como nos relatórios reais, o nome traz só os dias: o mesmo
+            # prefixo se repete todo mês
+            prefixo = f"TABLOIDE {data_inicial:%d} A {data_final:%d}"
+            skus = gerador.choice(quantidade_skus, skus_por_tabloide, replace=False)
+            multiplos_modelos = gerador.random() < 0.5
+            for modelo in modelos_encarte:
+                for sku in skus:
+                    desconto = (
+                        0.85 if not multiplos_modelos else gerador.uniform(0.8, 0.9)
+                    )
+                    linhas.append(
+                        {
+                            "Descricao": f"{prefixo} - {modelo}",
+                            "Dt.Valid.Ini": f"{data_inicial:%d/%m/%y}",
+                            "Dt.Valid.Fin": f"{data_final:%d/%m/%y}",
+                            "Item": f"{sku + 1:06d}",
+                            "Descricao.1": f"PRODUTO {sku + 1:06d}",
+                            "Pr.Un": precos[sku],
+                            "Quant.": int(gerador.integers(1, 4)),
+                            "Pr.Total": round(precos[sku] * desconto, 2),
+                        }
+                    )
+    # Linhas que o processamento do relatório deve descartar
+    linhas.append({**linhas[0], "Descricao": "RAIZ TABLOIDE - EF"})
+    linhas.append({**linhas[0], "Descricao": "OFERTA SEMANAL - EF"})
+
+    relatorio = pd.DataFrame(linhas)[colunas_relatorio]
+    for coluna in ("Pr.Un", "Pr.Total"):
+        relatorio[coluna] = formatar_decimal(relatorio[coluna].to_numpy())
+    return relatorio
+
+
+# Função para obter os meses padrão (julho a setembro) de uma quantidade de anos
+def meses_dos_anos(anos=1):
+    return [
+        f"{int(ano_mes[:4]) + deslocamento}{ano_mes[4:]}"
+        for deslocamento in range(anos)
+        for ano_mes in meses_padrao
+    ]
+
+
+# Função para gerar todos os arquivos de entrada em destino/files/AAAA/..., com
+# um CSV de descontos, um Excel por mês e um relatório para cada ano
+def gerar_dados(destino, escala=1, meses=None, semente=42):
+    meses = meses or meses_padrao
+    gerador = np.random.default_rng(semente)
+    precos = np.round(gerador.uniform(1, 60, quantidade_skus), 2)
+
+    linhas = {"csv": 0, "excel": 0, "relatorio": 0}
+    for ano in sorted({ano_mes[:4] for ano_mes in meses}):
+        meses_ano = [ano_mes for ano_mes in meses if ano_mes.startswith(ano)]
+        pasta_base = os.path.join(destino, "files", ano)
+        pastas = {
+            nome: os.path.join(pasta_base, nome)
+            for nome in ("desconto", "cupons", "relatorios")
+        }
+        for pasta in pastas.values():
+            os.makedirs(pasta, exist_ok=True)
+
+        arquivo_csv = os.path.join(pastas["desconto"], f"{ano}.csv")
+        for indice, ano_mes in enumerate(meses_ano):
+            descontos, itens = gerar_cupons_mes(
+                ano_mes, int(cupons_por_mes_base * escala), gerador, precos
+            )
+            descontos.to_csv(
+                arquivo_csv,
+                sep=";",
+                index=False,
+                mode="w" if indice == 0 else "a",
+                header=indice == 0,
+            )
+            gravar_excel_cupons(
+                itens, os.path.join(pastas["cupons"], f"CUPOM_{ano_mes}.xlsx")
+            )
+            linhas["csv"] += len(descontos)
+            linhas["excel"] += len(itens)
+
+        relatorio = gerar_relatorio(meses_ano, gerador, precos)
+        relatorio.to_csv(
+            os.path.join(pastas["relatorios"], f"rel_{ano}.csv"), sep=";", index=False
+        )
+        linhas["relatorio"] += len(relatorio)
+    return linhas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Gera CSV de descontos, Excel de cupons e relatório sintéticos."
+    )
+    parser.add_argument(
+        "destino", help="Pasta onde a estrutura files/AAAA será criada."
+    )
+    parser.add_argument(
+        "--escala", type=float, default=1, help="Multiplicador (1 a 100)."
+    )
+    parser.add_argument(
+        "--anos", type=int, default=1, help="Quantidade de anos, a partir de 2024."
+    )
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    linhas = gerar_dados(
+        args.destino,
+        escala=args.escala,
+        meses=meses_dos_anos(args.anos),
+        semente=args.semente,
+    )
+    print(
+        f"Gerados {linhas['csv']} cupons, {linhas['excel']} itens de cupom e "
+        f"{linhas['relatorio']} linhas de relatório em {args.destino}."
+    )
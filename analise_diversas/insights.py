@@ -0,0 +1,213 @@
+import argparse
+import json
+import os
+import sys
+
+campos_insights = [
+    "Total Itens",
+    "Total Desconto",
+    "Lucro Bruto",
+    "Lucro Liquido",
+    "Custo Encarte",
+    "Custo Total",
+]
+
+
+# Função para calcular os insights de cada período do relatório selecionado,
+# como no dashboard: todas as promoções do período entram na mesma análise
+def calcular_insights(relatorio, data_inicial=None, data_final=None, promocao=None):
+    from .analise import (
+        analisar_promocao,
+        consultar_promocoes,
+        indexar_promocoes,
+        obter_prefixo_periodo,
+    )
+
+    indice = indexar_promocoes(relatorio)
+    if data_inicial is not None or data_final is not None:
+        relatorio = consultar_promocoes(indice, data_inicial, data_final)
+    if promocao is not None:
+        nomes = [promocao] if promocao in set(relatorio["Nome Promocao"]) else []
+    else:
+        # Uma promoção de cada período
+        prefixos = relatorio["Nome Promocao"].map(obter_prefixo_periodo)
+        nomes = list(relatorio.loc[~prefixos.duplicated(), "Nome Promocao"])
+
+    resultados = []
+    for nome_promocao in nomes:
+        prefixo_periodo = obter_prefixo_periodo(nome_promocao)
+        promocoes = consultar_promocoes(
+            indice, data_inicial, data_final, prefixo_periodo
+        )
+        inicio = data_inicial or promocoes["Data Inicial"].min().date()
+        fim = data_final or promocoes["Data Final"].max().date()
+
+        resultado = {
+            "Prefixo Periodo": prefixo_periodo,
+            "Data Inicial": str(inicio),
+            "Data Final": str(fim),
+        }
+        resultado_analise = analisar_promocao(promocoes, nome_promocao, inicio, fim)
+        if resultado_analise is None:
+            resultado |= {campo: None for campo in campos_insights}
+            resultado["Cobertura"] = None
+        else:
+            custo_encarte, insights = resultado_analise
+            total_itens, total_desconto, lucro_bruto, lucro_liquido, custo_total = (
+                insights
+            )
+            valores = [
+                total_itens,
+                total_desconto,
+                lucro_bruto,
+                lucro_liquido,
+                custo_encarte,
+                custo_total,
+            ]
+            resultado |= {
+                campo: round(float(valor), 2)
+                for campo, valor in zip(campos_insights, valores)
+            }
+            resultado["Cobertura"] = (
+                round(float(lucro_liquido / custo_total), 4) if custo_total else None
+            )
+        resultados.append(resultado)
+    return resultados
+
+
+# Função para montar o ranking de rentabilidade dos períodos do relatório,
+# reaproveitando as métricas gravadas pelo transform quando estão atualizadas
+def montar_ranking(relatorio):
+    import pandas as pd
+    from .analise import (
+        calcular_metricas_promocoes,
+        colunas_periodo,
+        estruturar_promocoes,
+        ranquear_promocoes,
+    )
+    from .dataset_tratado import carregar_metricas_promocoes, carregar_vendas
+
+    if "Inicio Periodo" not in relatorio.columns:
+        relatorio = estruturar_promocoes(relatorio.copy())
+    metricas = carregar_metricas_promocoes(
+        relatorio["Data Inicial"].min(), relatorio["Data Final"].max()
+    )
+    if metricas is None or "Inicio Periodo" not in metricas.columns:
+        metricas, _, _ = calcular_metricas_promocoes(relatorio, carregar_vendas)
+    else:
+        # Apenas os períodos (prefixo e início da janela) do relatório
+        periodos = pd.MultiIndex.from_frame(
+            relatorio[colunas_periodo].astype({"Prefixo Periodo": str})
+        )
+        chaves = pd.MultiIndex.from_frame(
+            metricas[colunas_periodo].astype({"Prefixo Periodo": str})
+        )
+        metricas = metricas[chaves.isin(periodos)]
+    return ranquear_promocoes(metricas)
+
+
+# Função para exibir ou gravar o ranking no formato pedido
+def exibir_ranking(ranking, formato, arquivo_saida=None):
+    if arquivo_saida is not None:
+        if arquivo_saida.endswith(".parquet"):
+            ranking.to_parquet(arquivo_saida, index=False)
+        else:
+            ranking.to_csv(arquivo_saida, index=False, encoding="utf-8", sep=";")
+        print(f"Ranking de {len(ranking)} períodos salvo em {arquivo_saida}.")
+    elif formato == "json":
+        print(ranking.to_json(orient="records", date_format="iso", force_ascii=False))
+    elif formato == "csv":
+        print(ranking.to_csv(index=False, sep=";"), end="")
+    else:
+        print(ranking.to_string(index=False))
+
+
+# Função para exibir os resultados no formato pedido
+def exibir_resultados(resultados, formato):
+    if formato == "json":
+        print(json.dumps(resultados, ensure_ascii=False, indent=2))
+        return
+    if formato == "csv":
+        import csv
+
+        escritor = csv.DictWriter(
+            sys.stdout, fieldnames=list(resultados[0]), delimiter=";"
+        )
+        escritor.writeheader()
+        escritor.writerows(resultados)
+        return
+
+    for resultado in resultados:
+        print(
+            f"{resultado['Prefixo Periodo']} "
+            f"({resultado['Data Inicial']} a {resultado['Data Final']})"
+        )
+        if resultado["Total Itens"] is None:
+            print("  Nenhum dado de vendas encontrado para o período.")
+            continue
+        for campo in campos_insights:
+            print(f"  {campo:<16}{resultado[campo]:>16,.2f}")
+        print(f"  {'Cobertura':<16}{resultado['Cobertura'] or 0:>16.2%}")
+
+
+# Ponto de entrada da linha de comando (sem Streamlit)
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(
+        description="Calcula os insights das promoções sem abrir o dashboard."
+    )
+    parser.add_argument(
+        "--promocao", help="Nome de uma promoção; sem ele, analisa todos os períodos."
+    )
+    parser.add_argument("--inicio", help="Data inicial (AAAA-MM-DD).")
+    parser.add_argument("--fim", help="Data final (AAAA-MM-DD).")
+    parser.add_argument(
+        "--listar",
+        action="store_true",
+        help="Apenas lista as promoções do intervalo.",
+    )
+    parser.add_argument(
+        "--ranking",
+        action="store_true",
+        help="Calcula todos os períodos de uma vez e ordena por lucro líquido.",
+    )
+    parser.add_argument(
+        "--saida", help="Arquivo .csv ou .parquet onde o ranking será salvo."
+    )
+    parser.add_argument("--formato", choices=["texto", "json", "csv"], default="texto")
+    args = parser.parse_args(argumentos)
+
+    from datetime import date
+    from .analise import carregar_indice_promocoes, consultar_promocoes
+
+    data_inicial = date.fromisoformat(args.inicio) if args.inicio else None
+    data_final = date.fromisoformat(args.fim) if args.fim else None
+    indice = carregar_indice_promocoes()
+    relatorio = indice["relatorio"]
+
+    if data_inicial is not None or data_final is not None:
+        relatorio = consultar_promocoes(indice, data_inicial, data_final)
+
+    if args.listar:
+        for nome in relatorio["Nome Promocao"].unique():
+            print(nome)
+        return 0
+
+    if args.ranking:
+        if relatorio.empty:
+            print("Nenhuma promoção encontrada no intervalo.", file=sys.stderr)
+            return 1
+        exibir_ranking(montar_ranking(relatorio), args.formato, args.saida)
+        return 0
+
+    resultados = calcular_insights(relatorio, data_inicial, data_final, args.promocao)
+    if not resultados:
+        print(
+            "Nenhuma promoção encontrada para os filtros informados.", file=sys.stderr
+        )
+        return 1
+    exibir_resultados(resultados, args.formato)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+import cProfile
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# O módulo resource só existe em sistemas POSIX; no Windows a memória fica sem
+# medição
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Intervalo de amostragem da memória residente durante as medições
+intervalo_amostragem = 0.05
+
+
+# Função para ler a memória residente atual do processo, em bytes (None quando
+# a plataforma não oferece a medição)
+def memoria_residente():
+    try:
+        with open("/proc/self/statm") as arquivo:
+            return int(arquivo.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # Fora do Linux, usa o pico do processo (em KB no Linux, bytes no macOS)
+        if resource is None:
+            return None
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return pico if sys.platform == "darwin" else pico * 1024
+
+
+# Classe do amostrador de memória compartilhado: uma única thread por processo
+# lê a memória residente a cada intervalo e atualiza o pico de todas as
+# medições abertas. A thread termina quando não há medições e é recriada na
+# próxima (inclusive em um processo filho, que não herda a thread do pai).
+class AmostradorMemoria:
+    def __init__(self):
+        self._pid = None
+
+    def adicionar(self, medicao):
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._trava = threading.Lock()
+            self._medicoes = []
+            self._thread = None
+        with self._trava:
+            self._medicoes.append(medicao)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._amostrar, name="amostrador_memoria", daemon=True
+                )
+                self._thread.start()
+
+    def remover(self, medicao):
+        with self._trava:
+            self._medicoes.remove(medicao)
+
+    def _amostrar(self):
+        while True:
+            time.sleep(intervalo_amostragem)
+            memoria = memoria_residente()
+            with self._trava:
+                if not self._medicoes:
+                    self._thread = None
+                    return
+                for medicao in self._medicoes:
+                    medicao.pico = max(medicao.pico, memoria)
+
+
+amostrador_memoria = AmostradorMemoria()
+
+
+# Classe para medir a memória residente de um trecho: a memória no início, o
+# pico amostrado durante o trecho e o acréscimo do pico sobre o início (em
+# bytes; None quando a plataforma não oferece a medição)
+class MedicaoMemoria:
+    def __enter__(self):
+        self.inicial = self.pico = memoria_residente()
+        if self.inicial is not None:
+            amostrador_memoria.adicionar(self)
+        return self
+
+    def __exit__(self, *exc):
+        if self.inicial is not None:
+            amostrador_memoria.remover(self)
+            self.pico = max(self.pico, memoria_residente())
+        return False
+
+    def em_mb(self):
+        if self.inicial is None:
+            return {
+                "memoria_inicial_mb": None,
+                "pico_memoria_mb": None,
+                "memoria_adicional_mb": None,
+            }
+        return {
+            "memoria_inicial_mb": round(self.inicial / 2**20, 1),
+            "pico_memoria_mb": round(self.pico / 2**20, 1),
+            "memoria_adicional_mb": round((self.pico - self.inicial) / 2**20, 1),
+        }
+
+
+# Formatter que grava apenas os registros de etapa, um objeto JSON por linha
+class FormatadorJson(logging.Formatter):
+    def format(self, record):
+        return json.dumps(
+            {"momento": self.formatTime(record), **record.metricas},
+            ensure_ascii=False,
+        )
+
+
+# Função para criar o handler do log estruturado. Os registros de etapa
+# passam pelos mesmos handlers do log legível (inclusive pela fila dos
+# processos filhos), e este handler grava somente os que trazem métricas.
+def handler_metricas(caminho):
+    handler = logging.FileHandler(caminho, encoding="utf-8")
+    handler.setFormatter(FormatadorJson())
+    handler.addFilter(lambda record: hasattr(record, "metricas"))
+    return handler
+
+
+# Função para medir uma etapa: tempo, linhas, vazão e memória (no início, pico e
+# acréscimo durante a etapa). O bloco informa a quantidade de linhas processadas
+# em etapa["linhas"]. Uma etapa que falha também é registrada, com o erro, antes
+# de a exceção seguir adiante.
+@contextmanager
+def medir_etapa(nome, mes=None):
+    etapa = {"linhas": None}
+    erro = None
+    memoria = MedicaoMemoria()
+    inicio = time.perf_counter()
+    try:
+        with memoria:
+            yield etapa
+    except BaseException as e:
+        erro = e
+        raise
+    finally:
+        registrar_etapa(
+            nome, mes, etapa, time.perf_counter() - inicio, memoria.em_mb(), erro
+        )
+
+
+# Função para gravar o registro de uma etapa no log legível e no estruturado
+def registrar_etapa(nome, mes, etapa, segundos, memoria, erro):
+    linhas = etapa["linhas"]
+    metricas = {
+        "etapa": nome,
+        "mes": mes,
+        "linhas": linhas,
+        "segundos": round(segundos, 4),
+        "linhas_por_segundo": (
+            round(linhas / segundos, 1) if linhas is not None and segundos else None
+        ),
+        **memoria,
+        "pid": os.getpid(),
+        "erro": None if erro is None else f"{type(erro).__name__}: {erro}",
+    }
+    descricao = f"{mes}: " if mes else ""
+    descricao += f"etapa {nome} em {segundos:.2f}s"
+    if erro is not None:
+        descricao += f" (falhou: {metricas['erro']})"
+    if linhas is not None:
+        descricao += f", {linhas} linhas"
+        if segundos:
+            descricao += f" ({linhas / segundos:,.0f} linhas/s)"
+    if memoria["pico_memoria_mb"] is not None:
+        descricao += (
+            f", pico de memória {memoria['pico_memoria_mb']} MB "
+            f"(+{memoria['memoria_adicional_mb']} MB)"
+        )
+    descricao += "."
+    if erro is None:
+        logging.info(descricao, extra={"metricas": metricas})
+    else:
+        logging.error(descricao, extra={"metricas": metricas})
+
+
+# Função para executar uma chamada sob o cProfile e salvar as estatísticas
+def executar_com_perfil(arquivo_perfil, funcao, *args, **kwargs):
+    perfil = cProfile.Profile()
+    try:
+        return perfil.runcall(funcao, *args, **kwargs)
+    finally:
+        perfil.dump_stats(arquivo_perfil)
+        logging.info(f"Perfil do cProfile salvo em {arquivo_perfil}.")
@@ -1,130 +1,20 @@
+import locale
 import pandas as pd
 import streamlit as st
-import os
-import locale
-
-locale.setlocale(locale.LC_ALL, "pt_BR.UTF-8")
-
-# Configuração inicial da aplicação
-st.set_page_config(
-    page_title="Análise Tabloide Leve +", page_icon=":bar_chart:", layout="wide"
+from analise_diversas.analise import (
+    analisar_promocao,
+    carregar_indice_promocoes,
+    carregar_vendas_correlacionadas,
+    como_texto,
+    consultar_promocoes,
+    obter_prefixo_periodo,
+    pagina_da_tabela,
+    selecionar_linhas,
 )
+from analise_diversas.config.config_interface import tamanhos_pagina
 
-
-# Função para carregar os arquivos CSV
-def carregar_dados():
-    caminho_relatorio_tratado = "../files/tratado/relatorio_tratado.csv"
-    relatorio_tratado = pd.read_csv(caminho_relatorio_tratado, sep=";")
-    return relatorio_tratado
-
-
-# Função para carregar os arquivos mensais dinamicamente
-def carregar_dados_mensais(data_inicial, data_final):
-    caminho_pasta = "../files/tratado"
-    arquivos_mensais = []
-    for mes in pd.date_range(start=data_inicial, end=data_final, freq="MS").strftime(
-        "%Y-%m"
-    ):
-        caminho_arquivo = os.path.join(caminho_pasta, f"{mes}_tratado.csv")
-        if os.path.exists(caminho_arquivo):
-            arquivos_mensais.append(pd.read_csv(caminho_arquivo, sep=";"))
-
-    if arquivos_mensais:
-        return pd.concat(arquivos_mensais, ignore_index=True)
-    else:
-        return pd.DataFrame()
-
-
-# Função para filtrar os dados de acordo com o intervalo de datas
-def filtrar_por_data(dados, data_inicial, data_final):
-    filtrados = dados[
-        (dados["Data Inicial"] >= data_inicial) & (dados["Data Final"] <= data_final)
-    ]
-    return filtrados
-
-
-# Função para filtrar promoções por período
-def filtrar_promocoes_por_periodo(dados, prefixo_periodo):
-    filtrados = dados[dados["Nome Promocao"].str.startswith(prefixo_periodo)]
-    return filtrados
-
-
-# Função para correlacionar itens entre os dois relatórios
-def correlacionar_vendas(promocoes, vendas):
-    vendas["SKU"] = vendas["Item"].astype(str)  # Garantir que o SKU esteja como string
-    promocoes["SKU"] = promocoes["SKU"].astype(str)
-
-    # Filtrar vendas para remover itens com "P" na coluna Promoção
-    vendas = vendas[vendas["Promoção"] != "P"]
-
-    correlacionados = pd.merge(
-        promocoes, vendas, on="SKU", how="inner", suffixes=("_promo", "_venda")
-    )
-    correlacionados.to_csv("teste.csv", sep=";", index=False)
-    correlacionados = correlacionados[
-        correlacionados["Quantidade"] >= correlacionados["Ativacao"]
-    ]
-    correlacionados["Desconto Aplicado"] = (
-        correlacionados["Preco Vendido"] - correlacionados["Preco Promocao"]
-    ) * correlacionados["Quantidade"]
-    correlacionados["Lucro Bruto"] = (
-        correlacionados["Preco Promocao"] * correlacionados["Quantidade"]
-    )
-    return correlacionados
-
-
-def calcular_custos_encarte(correlacionados, nome_promocao):
-    # Identifica o prefixo do período com base na promoção selecionada
-    prefixo_periodo = " - ".join(
-        nome_promocao.split(" - ")[:-1]
-    )  # Pega tudo antes do último " - "
-
-    # Filtra todas as promoções relacionadas ao mesmo período
-    filtrados = correlacionados[
-        correlacionados["Nome Promocao"].str.startswith(prefixo_periodo)
-    ]
-
-    # Dicionário para armazenar os preços por SKU e loja
-    preco_por_sku_loja = {}
-
-    for _, linha in filtrados.iterrows():
-        sku = linha["SKU"]
-        preco_promocional = linha["Preco Promocao"]
-        loja = linha["Nome Promocao"].split(" - ")[1]
-
-        if sku not in preco_por_sku_loja:
-            preco_por_sku_loja[sku] = {}
-
-        preco_por_sku_loja[sku][loja] = {
-            "preco_promocional": preco_promocional,
-        }
-
-    # Verifica se todos os SKUs têm preços promocionais iguais entre as lojas
-    modelo_unico = True
-    for sku, lojas in preco_por_sku_loja.items():
-        preco_promocional_comum = list(lojas.values())[0]["preco_promocional"]
-
-        for loja, precos in lojas.items():
-            if precos["preco_promocional"] != preco_promocional_comum:
-                modelo_unico = False
-                break
-
-        if not modelo_unico:
-            break
-
-    # Define o custo com base no modelo identificado
-    custo = 3600 if modelo_unico else 6400
-    return custo
-
-
-# Função para gerar insights
-def gerar_insights(correlacionados, custo_encarte):
-    total_itens = correlacionados["Quantidade"].sum()
-    total_desconto = correlacionados["Desconto Aplicado"].sum()
-    lucro_bruto = correlacionados["Lucro Bruto"].sum()
-    lucro_liquido = lucro_bruto - custo_encarte - total_desconto
-    custo_total = total_desconto + custo_encarte
-    return total_itens, total_desconto, lucro_bruto, lucro_liquido, custo_total
+# Colunas de texto pesquisadas pelo filtro das tabelas
+colunas_filtro_tabelas = ["Nome Promocao", "SKU", "Nome Item"]
 
 
 # Funções de formatação
@@ -136,89 +26,172 @@ def formatar_numero(valor):
     return f"{valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
 
 
-# Interface do Streamlit
-st.title("Análise de Tabloide - Leve Mais")
-col1, col2, col3, col4, col5, col6, col7 = st.columns([0.7, 0.7, 1.5, 0.7, 0.5, 1, 2])
-
-# Carregar dados de promoções
-relatorio_tratado = carregar_dados()
-data_minima = pd.to_datetime(relatorio_tratado["Data Inicial"]).min()
-data_maxima = pd.to_datetime(relatorio_tratado["Data Final"]).max()
-
-st.subheader("Seleção de Período de Promoção")
-data_inicial = col1.date_input(
-    "Data Inicial",
-    value=None,
-    min_value=data_minima,
-    max_value=data_maxima,
-    format="DD/MM/YYYY",
-)
-data_final = col2.date_input(
-    "Data Final",
-    value=None,
-    min_value=data_minima,
-    max_value=data_maxima,
-    format="DD/MM/YYYY",
-)
+# Função para exibir uma tabela paginada. Filtro, ordenação e paginação são
+# feitos no servidor sobre o DataFrame já carregado, e só as linhas da página
+# são enviadas ao navegador.
+def exibir_tabela_paginada(dados, chave, colunas_texto=None):
+    col1, col2, col3, col4, col5 = st.columns([2, 1.2, 0.8, 0.6, 0.6])
+    texto = col1.text_input(
+        "Filtrar", key=f"{chave}_filtro", placeholder="Promoção, SKU ou item"
+    )
+    ordenar_por = col2.selectbox(
+        "Ordenar por",
+        [None, *dados.columns],
+        format_func=lambda coluna: "Ordem original" if coluna is None else coluna,
+        key=f"{chave}_ordem",
+    )
+    sentido = col3.selectbox(
+        "Sentido", ["Crescente", "Decrescente"], key=f"{chave}_sentido"
+    )
+    tamanho_pagina = col4.selectbox("Linhas", tamanhos_pagina, key=f"{chave}_linhas")
+
+    posicoes = selecionar_linhas(
+        dados,
+        texto.strip() or None,
+        colunas_texto,
+        ordenar_por,
+        sentido == "Crescente",
+    )
+    total_paginas = max(1, -(-len(posicoes) // tamanho_pagina))
+
+    # Volta para a última página quando o filtro reduz a quantidade de páginas
+    chave_pagina = f"{chave}_pagina"
+    if st.session_state.get(chave_pagina, 1) > total_paginas:
+        st.session_state[chave_pagina] = total_paginas
+    pagina = int(
+        col5.number_input(
+            "Página", min_value=1, max_value=total_paginas, step=1, key=chave_pagina
+        )
+    )
 
-dados_filtrados_por_data = filtrar_por_data(
-    relatorio_tratado, str(data_inicial), str(data_final)
-)
+    linhas_pagina = pagina_da_tabela(dados, posicoes, pagina, tamanho_pagina)
+    st.dataframe(linhas_pagina, use_container_width=True, hide_index=True)
+    inicio = (pagina - 1) * tamanho_pagina
+    legenda = (
+        f"Linhas {inicio + 1 if len(linhas_pagina) else 0} a "
+        f"{inicio + len(linhas_pagina)} de {len(posicoes)}"
+    )
+    if len(posicoes) != len(dados):
+        legenda += f" (filtradas de {len(dados)})"
+    st.caption(f"{legenda} - página {pagina} de {total_paginas}.")
 
-if not dados_filtrados_por_data.empty:
-    nomes_promocoes = dados_filtrados_por_data["Nome Promocao"].unique()
-    nome_promocao = col3.selectbox("Selecione a Promoção", nomes_promocoes)
 
-    # Obter o prefixo do período da promoção selecionada
-    prefixo_periodo = " - ".join(nome_promocao.split(" - ")[:-1])
+# Interface do Streamlit
+def main():
+    locale.setlocale(locale.LC_ALL, "pt_BR.UTF-8")
 
-    # Filtrar promoções do mesmo período
-    promocoes_filtradas = filtrar_promocoes_por_periodo(
-        dados_filtrados_por_data, prefixo_periodo
+    # Configuração inicial da aplicação
+    st.set_page_config(
+        page_title="Análise Tabloide Leve +", page_icon=":bar_chart:", layout="wide"
     )
 
-    st.subheader("Promoções Selecionadas")
-    promocoes_filtradas["SKU"] = promocoes_filtradas["SKU"].astype(str)
-    st.dataframe(
-        promocoes_filtradas,
-        use_container_width=True,
-        hide_index=True,
+    st.title("Análise de Tabloide - Leve Mais")
+    col1, col2, col3, col4, col5, col6, col7 = st.columns(
+        [0.7, 0.7, 1.5, 0.7, 0.5, 1, 2]
     )
 
-    if not promocoes_filtradas.empty:
-        historico_vendas = carregar_dados_mensais(data_inicial, data_final)
-        if not historico_vendas.empty:
-            vendas_correlacionadas = correlacionar_vendas(
-                promocoes_filtradas, historico_vendas
-            )
-            custo_encarte = calcular_custos_encarte(
-                vendas_correlacionadas, nome_promocao
-            )
-            total_itens, total_desconto, lucro_bruto, lucro_liquido, custo_total = (
-                gerar_insights(vendas_correlacionadas, custo_encarte)
+    # Carregar dados de promoções, já indexados por data e por período
+    indice_promocoes = carregar_indice_promocoes()
+    relatorio_tratado = indice_promocoes["relatorio"]
+    data_minima = pd.to_datetime(relatorio_tratado["Data Inicial"]).min()
+    data_maxima = pd.to_datetime(relatorio_tratado["Data Final"]).max()
+
+    st.subheader("Seleção de Período de Promoção")
+    data_inicial = col1.date_input(
+        "Data Inicial",
+        value=None,
+        min_value=data_minima,
+        max_value=data_maxima,
+        format="DD/MM/YYYY",
+    )
+    data_final = col2.date_input(
+        "Data Final",
+        value=None,
+        min_value=data_minima,
+        max_value=data_maxima,
+        format="DD/MM/YYYY",
+    )
+
+    if data_inicial is None or data_final is None:
+        dados_filtrados_por_data = relatorio_tratado.iloc[0:0]
+    else:
+        dados_filtrados_por_data = consultar_promocoes(
+            indice_promocoes, data_inicial, data_final
+        )
+
+    if not dados_filtrados_por_data.empty:
+        nomes_promocoes = dados_filtrados_por_data["Nome Promocao"].unique()
+        nome_promocao = col3.selectbox("Selecione a Promoção", nomes_promocoes)
+
+        # Obter o prefixo do período da promoção selecionada
+        prefixo_periodo = obter_prefixo_periodo(nome_promocao)
+
+        # Filtrar promoções do mesmo período
+        promocoes_filtradas = consultar_promocoes(
+            indice_promocoes, data_inicial, data_final, prefixo_periodo
+        )
+
+        st.subheader("Promoções Selecionadas")
+        promocoes_filtradas = promocoes_filtradas.assign(
+            SKU=como_texto(promocoes_filtradas["SKU"])
+        )
+        exibir_tabela_paginada(promocoes_filtradas, "promocoes", colunas_filtro_tabelas)
+
+        if not promocoes_filtradas.empty:
+            resultado_analise = analisar_promocao(
+                promocoes_filtradas, nome_promocao, data_inicial, data_final
             )
+            if resultado_analise is not None:
+                custo_encarte, insights = resultado_analise
+                total_itens, total_desconto, lucro_bruto, lucro_liquido, custo_total = (
+                    insights
+                )
 
-            st.subheader("Insights da Promoção")
-            col1, col2, col3, col4, col5, col6 = st.columns([1, 1, 1, 1, 1, 1])
-            col1.metric("Total de Itens Vendidos", formatar_numero(total_itens))
-            col2.metric("Total de Descontos Concedidos", formatar_moeda(total_desconto))
-            col3.metric("Lucro Bruto", formatar_moeda(lucro_bruto))
-            col4.metric("Lucro Líquido", formatar_moeda(lucro_liquido))
-            col5.metric("Custo de Impressão do Encarte", formatar_moeda(custo_encarte))
-            col6.metric("Custo da Promoção", formatar_moeda(custo_total))
-
-            if lucro_liquido >= custo_total:
-                st.success(
-                    f"O lucro líquido cobriu o custo total da promoção ({(lucro_liquido / custo_total) * 100:.2f}%)."
+                st.subheader("Insights da Promoção")
+                col1, col2, col3, col4, col5, col6 = st.columns([1, 1, 1, 1, 1, 1])
+                col1.metric("Total de Itens Vendidos", formatar_numero(total_itens))
+                col2.metric(
+                    "Total de Descontos Concedidos", formatar_moeda(total_desconto)
                 )
+                col3.metric("Lucro Bruto", formatar_moeda(lucro_bruto))
+                col4.metric("Lucro Líquido", formatar_moeda(lucro_liquido))
+                col5.metric(
+                    "Custo de Impressão do Encarte", formatar_moeda(custo_encarte)
+                )
+                col6.metric("Custo da Promoção", formatar_moeda(custo_total))
+
+                if lucro_liquido >= custo_total:
+                    st.success(
+                        f"O lucro líquido cobriu o custo total da promoção ({(lucro_liquido / custo_total) * 100:.2f}%)."
+                    )
+                else:
+                    deficit = custo_total - lucro_liquido
+                    st.error(
+                        f"O lucro líquido não cobriu o custo total. Faltaram {formatar_moeda(deficit)} ({(lucro_liquido / custo_total) * 100:.2f}%)."
+                    )
+
+                # Detalhamento opcional: as vendas só são carregadas quando pedido
+                if st.checkbox("Exibir vendas correlacionadas", key="detalhar_vendas"):
+                    st.subheader("Vendas Correlacionadas")
+                    exibir_tabela_paginada(
+                        carregar_vendas_correlacionadas(
+                            promocoes_filtradas,
+                            nome_promocao,
+                            data_inicial,
+                            data_final,
+                        ),
+                        "vendas",
+                        colunas_filtro_tabelas,
+                    )
             else:
-                deficit = custo_total - lucro_liquido
-                st.error(
-                    f"O lucro líquido não cobriu o custo total. Faltaram {formatar_moeda(deficit)} ({(lucro_liquido / custo_total) * 100:.2f}%)."
+                st.warning(
+                    "Nenhum dado de vendas encontrado para o período selecionado."
                 )
         else:
-            st.warning("Nenhum dado de vendas encontrado para o período selecionado.")
+            st.warning("Nenhuma promoção encontrada para os filtros selecionados.")
     else:
-        st.warning("Nenhuma promoção encontrada para os filtros selecionados.")
-else:
-    st.warning("Nenhuma promoção disponível para o período selecionado.")
+        st.warning("Nenhuma promoção disponível para o período selecionado.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,27 @@
+from io import BytesIO
 import pandas as pd
 import streamlit as st
-import os
 import requests
-from io import StringIO
-import tempfile
-
+from analise_diversas.analise import (
+    calcular_custos_encarte,
+    como_texto,
+    consultar_promocoes,
+    correlacionar_vendas,
+    gerar_insights,
+    indexar_promocoes,
+    obter_prefixo_periodo,
+)
+from analise_diversas.cache_resultados import obter_ou_calcular
+from analise_diversas.config.config_interface import (
+    codigos_promocao_excluidos_remoto,
+    colunas_vendas_correlacionadas,
+    url_relatorio_remoto,
+    url_relatorio_remoto_csv,
+    url_tratado_remoto,
+)
+from analise_diversas.dataset_tratado import ler_relatorio
+from analise_diversas.interface import colunas_filtro_tabelas, exibir_tabela_paginada
+from analise_diversas.remoto import baixar, carregar_parquets_remotos, versao_url
 
 # Configuração inicial da aplicação
 st.set_page_config(
@@ -12,139 +29,57 @@ st.set_page_config(
 )
 
 
-# Função para carregar os arquivos .parquet
+# Função para carregar o relatório tratado publicado, já indexado por data e
+# por período. Usa o Parquet e, se ele não estiver disponível, o CSV. O índice
+# fica em cache para cada versão (ETag / Last-Modified) do arquivo remoto, então
+# o relatório só é lido de novo quando ele muda.
 def carregar_dados():
-    url = "https://grupovivenci.com.br/relatorio_tratado.csv"
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
-    try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()  # Levanta um erro para códigos de status HTTP inválidos
-        dados = pd.read_csv(StringIO(response.text), sep=";")
-        return dados
-    except requests.exceptions.RequestException as e:
-        st.error(f"Erro ao carregar dados da URL: {url}")
-        raise e
-
-
-# Função para carregar os arquivos mensais dinamicamente
-# Função para carregar os arquivos mensais dinamicamente
-def carregar_dados_mensais(data_inicial, data_final):
-    base_url = "https://grupovivenci.com.br/tratado/"
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
-    arquivos_mensais = []
-
-    for mes in pd.date_range(start=data_inicial, end=data_final, freq="MS").strftime(
-        "%Y-%m"
+    for url, formato in (
+        (url_relatorio_remoto, "parquet"),
+        (url_relatorio_remoto_csv, "csv"),
     ):
-        url_arquivo = f"{base_url}{mes}_tratado.parquet"
         try:
-            response = requests.get(url_arquivo, headers=headers)
-            response.raise_for_status()  # Verifica se a resposta HTTP foi bem-sucedida
-
-            # Salvar o conteúdo como um arquivo temporário
-            with tempfile.NamedTemporaryFile(
-                delete=False, suffix=".parquet"
-            ) as temp_file:
-                temp_file.write(response.content)
-                temp_file_path = temp_file.name
-
-            # Ler o arquivo Parquet temporário
-            arquivo = pd.read_parquet(temp_file_path)
-            arquivos_mensais.append(arquivo)
-        except requests.exceptions.RequestException:
-            st.warning(f"Arquivo não encontrado ou inacessível: {url_arquivo}")
-        except Exception as e:
-            st.error(f"Erro ao processar o arquivo {url_arquivo}: {e}")
-
-    if arquivos_mensais:
-        return pd.concat(arquivos_mensais, ignore_index=True)
+            conteudo = baixar(url)
+            break
+        except requests.exceptions.RequestException as e:
+            erro = e
     else:
-        return pd.DataFrame()
+        st.error(f"Erro ao carregar dados da URL: {url_relatorio_remoto}")
+        raise erro
 
+    def indexar():
+        return indexar_promocoes(ler_relatorio(BytesIO(conteudo), formato))
 
-# Função para filtrar os dados de acordo com o intervalo de datas
-def filtrar_por_data(dados, data_inicial, data_final):
-    filtrados = dados[
-        (dados["Data Inicial"] >= data_inicial) & (dados["Data Final"] <= data_final)
-    ]
-    return filtrados
+    versao = versao_url(url)
+    if versao is None:
+        return indexar()
+    return obter_ou_calcular(("indice_promocoes_remoto", url, versao), indexar)
 
 
-# Função para filtrar promoções por período
-def filtrar_promocoes_por_periodo(dados, prefixo_periodo):
-    filtrados = dados[dados["Nome Promocao"].str.startswith(prefixo_periodo)]
-    return filtrados
+# Colunas das vendas usadas na correlação e nos insights
+colunas_vendas = ["Loja", "Data", "Item", "Quantidade", "Pr.Venda Total", "Promoção"]
 
 
-# Função para correlacionar itens entre os dois relatórios
-def correlacionar_vendas(promocoes, vendas):
-    vendas["SKU"] = vendas["Item"].astype(str)  # Garantir que o SKU esteja como string
-    promocoes["SKU"] = promocoes["SKU"].astype(str)
-
-    # Filtrar vendas para remover itens com "P" na coluna Promoção
-    vendas = vendas[vendas["Promoção"] != "P"]
-    vendas = vendas[vendas["Promoção"] != "R"]
-
-    correlacionados = pd.merge(
-        promocoes, vendas, on="SKU", how="inner", suffixes=("_promo", "_venda")
-    )
-    correlacionados.to_csv("teste.csv", sep=";", index=False)
-    correlacionados = correlacionados[
-        correlacionados["Quantidade"] >= correlacionados["Ativacao"]
+# Função para carregar os arquivos mensais em paralelo. Com colunas/SKUs, lê
+# via HTTP Range só o rodapé e os trechos necessários de cada Parquet
+def carregar_dados_mensais(data_inicial, data_final, skus=None, colunas=None):
+    urls = [
+        f"{url_tratado_remoto}{mes}_tratado.parquet"
+        for mes in pd.date_range(
+            start=data_inicial, end=data_final, freq="MS"
+        ).strftime("%Y-%m")
     ]
-    correlacionados["Desconto Aplicado"] = (
-        correlacionados["Preco Vendido"] - correlacionados["Preco Promocao"]
-    ) * correlacionados["Quantidade"]
-    correlacionados["Lucro Bruto"] = (
-        correlacionados["Preco Promocao"] * correlacionados["Quantidade"]
-    )
-    return correlacionados
-
-
-def calcular_custos_encarte(correlacionados, nome_promocao):
-    prefixo_periodo = " - ".join(nome_promocao.split(" - ")[:-1])
-
-    filtrados = correlacionados[
-        correlacionados["Nome Promocao"].str.startswith(prefixo_periodo)
-    ]
-
-    preco_por_sku_loja = {}
-    for _, linha in filtrados.iterrows():
-        sku = linha["SKU"]
-        preco_promocional = linha["Preco Promocao"]
-        loja = linha["Nome Promocao"].split(" - ")[1]
-
-        if sku not in preco_por_sku_loja:
-            preco_por_sku_loja[sku] = {}
-
-        preco_por_sku_loja[sku][loja] = {
-            "preco_promocional": preco_promocional,
-        }
-
-    modelo_unico = True
-    for sku, lojas in preco_por_sku_loja.items():
-        preco_promocional_comum = list(lojas.values())[0]["preco_promocional"]
-
-        for loja, precos in lojas.items():
-            if precos["preco_promocional"] != preco_promocional_comum:
-                modelo_unico = False
-                break
-
-        if not modelo_unico:
-            break
-
-    custo = 3600 if modelo_unico else 6400
-    return custo
-
+    arquivos_mensais, erros = carregar_parquets_remotos(urls, colunas, skus)
+    for url_arquivo, erro in erros:
+        if isinstance(erro, requests.exceptions.RequestException):
+            st.warning(f"Arquivo não encontrado ou inacessível: {url_arquivo}")
+        else:
+            st.error(f"Erro ao processar o arquivo {url_arquivo}: {erro}")
 
-# Função para gerar insights
-def gerar_insights(correlacionados, custo_encarte):
-    total_itens = correlacionados["Quantidade"].sum()
-    total_desconto = correlacionados["Desconto Aplicado"].sum()
-    lucro_bruto = correlacionados["Lucro Bruto"].sum()
-    lucro_liquido = lucro_bruto - custo_encarte - total_desconto
-    custo_total = total_desconto + custo_encarte
-    return total_itens, total_desconto, lucro_bruto, lucro_liquido, custo_total
+    if arquivos_mensais:
+        return pd.concat(arquivos_mensais, ignore_index=True)
+    else:
+        return pd.DataFrame()
 
 
 # Funções de formatação
@@ -161,9 +96,10 @@ st.title("Análise de Tabloide - Leve Mais")
 col1, col2, col3, col4, col5, col6, col7 = st.columns([0.7, 0.7, 1.5, 0.7, 0.5, 1, 2])
 
 # Carregar dados de promoções
-relatorio_tratado = carregar_dados()
-data_minima = pd.to_datetime(relatorio_tratado["Data Inicial"]).min()
-data_maxima = pd.to_datetime(relatorio_tratado["Data Final"]).max()
+indice_promocoes = carregar_dados()
+relatorio_tratado = indice_promocoes["relatorio"]
+data_minima = relatorio_tratado["Data Inicial"].min()
+data_maxima = relatorio_tratado["Data Final"].max()
 
 st.subheader("Seleção de Período de Promoção")
 data_inicial = col1.date_input(
@@ -173,9 +109,12 @@ data_final = col2.date_input(
     "Data Final", value=None, min_value=data_minima, max_value=data_maxima
 )
 
-dados_filtrados_por_data = filtrar_por_data(
-    relatorio_tratado, str(data_inicial), str(data_final)
-)
+if data_inicial is None or data_final is None:
+    dados_filtrados_por_data = relatorio_tratado.iloc[0:0]
+else:
+    dados_filtrados_por_data = consultar_promocoes(
+        indice_promocoes, data_inicial, data_final
+    )
 
 
 if not dados_filtrados_por_data.empty:
@@ -183,26 +122,29 @@ if not dados_filtrados_por_data.empty:
     nome_promocao = col3.selectbox("Selecione a Promoção", nomes_promocoes)
 
     # Obter o prefixo do período da promoção selecionada
-    prefixo_periodo = " - ".join(nome_promocao.split(" - ")[:-1])
+    prefixo_periodo = obter_prefixo_periodo(nome_promocao)
 
     # Filtrar promoções do mesmo período
-    promocoes_filtradas = filtrar_promocoes_por_periodo(
-        dados_filtrados_por_data, prefixo_periodo
+    promocoes_filtradas = consultar_promocoes(
+        indice_promocoes, data_inicial, data_final, prefixo_periodo
     )
 
     st.subheader("Promoções Selecionadas")
-    promocoes_filtradas["SKU"] = promocoes_filtradas["SKU"].astype(str)
-    st.dataframe(
-        promocoes_filtradas,
-        use_container_width=True,
-        hide_index=True,
+    promocoes_filtradas = promocoes_filtradas.assign(
+        SKU=como_texto(promocoes_filtradas["SKU"])
     )
+    exibir_tabela_paginada(promocoes_filtradas, "promocoes", colunas_filtro_tabelas)
 
     if not promocoes_filtradas.empty:
-        historico_vendas = carregar_dados_mensais(data_inicial, data_final)
+        historico_vendas = carregar_dados_mensais(
+            data_inicial,
+            data_final,
+            skus=promocoes_filtradas["SKU"].unique(),
+            colunas=colunas_vendas,
+        )
         if not historico_vendas.empty:
             vendas_correlacionadas = correlacionar_vendas(
-                promocoes_filtradas, historico_vendas
+                promocoes_filtradas, historico_vendas, codigos_promocao_excluidos_remoto
             )
             custo_encarte = calcular_custos_encarte(
                 vendas_correlacionadas, nome_promocao
@@ -229,6 +171,18 @@ if not dados_filtrados_por_data.empty:
                 st.error(
                     f"O lucro líquido não cobriu o custo total. Faltaram {formatar_moeda(deficit)} ({(lucro_liquido / custo_total) * 100:.2f}%)."
                 )
+
+            # Detalhamento opcional das vendas que entraram nos insights
+            if st.checkbox("Exibir vendas correlacionadas", key="detalhar_vendas"):
+                st.subheader("Vendas Correlacionadas")
+                colunas = [
+                    coluna
+                    for coluna in colunas_vendas_correlacionadas
+                    if coluna in vendas_correlacionadas.columns
+                ]
+                exibir_tabela_paginada(
+                    vendas_correlacionadas[colunas], "vendas", colunas_filtro_tabelas
+                )
         else:
             st.warning("Nenhum dado de vendas encontrado para o período selecionado.")
     else:
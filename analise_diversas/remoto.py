@@ -0,0 +1,392 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import pandas as pd
+import pyarrow.parquet as pq
+import requests
+from requests.adapters import HTTPAdapter
+from .config.config_interface import (
+    diretorio_cache_remoto,
+    conexoes_remotas,
+    tempo_limite_remoto,
+    tamanho_bloco_remoto,
+    blocos_remotos_em_cache,
+)
+
+# Quantas vezes a leitura parcial recomeça quando o arquivo muda no servidor
+tentativas_arquivo_alterado = 3
+
+cabecalhos_padrao = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
+
+_sessao = None
+_trava_sessao = threading.Lock()
+
+# Cache LRU de blocos baixados via Range, chaveado por (url, versão, bloco)
+_blocos = OrderedDict()
+_trava_blocos = threading.Lock()
+
+
+# Função para obter a sessão HTTP compartilhada, com pool de conexões
+def obter_sessao():
+    global _sessao
+    with _trava_sessao:
+        if _sessao is None:
+            sessao = requests.Session()
+            adaptador = HTTPAdapter(
+                pool_connections=conexoes_remotas, pool_maxsize=conexoes_remotas
+            )
+            sessao.mount("http://", adaptador)
+            sessao.mount("https://", adaptador)
+            sessao.headers.update(cabecalhos_padrao)
+            _sessao = sessao
+    return _sessao
+
+
+# Função para montar os caminhos do corpo e dos metadados em cache de uma URL
+def arquivos_cache_url(url):
+    chave = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    base = os.path.join(diretorio_cache_remoto, chave)
+    return f"{base}.bin", f"{base}.json"
+
+
+# Função para ler o corpo e os validadores (ETag / Last-Modified) em cache
+def ler_cache_url(url):
+    arquivo_corpo, arquivo_meta = arquivos_cache_url(url)
+    try:
+        with open(arquivo_meta, encoding="utf-8") as arquivo:
+            metadados = json.load(arquivo)
+        with open(arquivo_corpo, "rb") as arquivo:
+            return arquivo.read(), metadados
+    except (OSError, ValueError):
+        return None, {}
+
+
+# Função para obter a versão (ETag / Last-Modified) do conteúdo em cache de uma
+# URL, sem ler o corpo. Retorna None quando o servidor não informou validadores.
+def versao_url(url):
+    _, arquivo_meta = arquivos_cache_url(url)
+    try:
+        with open(arquivo_meta, encoding="utf-8") as arquivo:
+            metadados = json.load(arquivo)
+    except (OSError, ValueError):
+        return None
+    return (metadados.get("etag"), metadados.get("last_modified"))
+
+
+# Função para gravar o corpo e os validadores de uma resposta
+def gravar_cache_url(url, conteudo, resposta):
+    metadados = {
+        "etag": resposta.headers.get("ETag"),
+        "last_modified": resposta.headers.get("Last-Modified"),
+    }
+    if not metadados["etag"] and not metadados["last_modified"]:
+        return
+    os.makedirs(diretorio_cache_remoto, exist_ok=True)
+    arquivo_corpo, arquivo_meta = arquivos_cache_url(url)
+    sufixo = f".{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(arquivo_corpo + sufixo, "wb") as arquivo:
+        arquivo.write(conteudo)
+    with open(arquivo_meta + sufixo, "w", encoding="utf-8") as arquivo:
+        json.dump(metadados, arquivo)
+    os.replace(arquivo_corpo + sufixo, arquivo_corpo)
+    os.replace(arquivo_meta + sufixo, arquivo_meta)
+
+
+# Função para baixar uma URL com requisição condicional: se o servidor
+# responder 304, o conteúdo vem do cache local sem novo download
+def baixar(url):
+    conteudo_cache, metadados = ler_cache_url(url)
+    cabecalhos = {}
+    if conteudo_cache is not None:
+        if metadados.get("etag"):
+            cabecalhos["If-None-Match"] = metadados["etag"]
+        if metadados.get("last_modified"):
+            cabecalhos["If-Modified-Since"] = metadados["last_modified"]
+
+    resposta = obter_sessao().get(url, headers=cabecalhos, timeout=tempo_limite_remoto)
+    if resposta.status_code == 304 and conteudo_cache is not None:
+        return conteudo_cache
+    resposta.raise_for_status()
+    gravar_cache_url(url, resposta.content, resposta)
+    return resposta.content
+
+
+# Função para carregar um Parquet remoto direto da memória, sem arquivo temporário
+def carregar_parquet_remoto(url, colunas=None):
+    return pd.read_parquet(BytesIO(baixar(url)), columns=colunas)
+
+
+# Função para montar a pasta em disco dos blocos de uma URL e a subpasta da
+# versão (ETag / Last-Modified) a que eles pertencem
+def pastas_blocos_disco(url, validador):
+    pasta_url = os.path.join(
+        diretorio_cache_remoto,
+        "blocos",
+        hashlib.sha256(url.encode("utf-8")).hexdigest(),
+    )
+    versao = hashlib.sha256(validador.encode("utf-8")).hexdigest()
+    return pasta_url, os.path.join(pasta_url, versao)
+
+
+# Função para descartar do disco os blocos de versões antigas de uma URL
+def limpar_blocos_antigos(url, validador):
+    pasta_url, pasta_versao = pastas_blocos_disco(url, validador)
+    try:
+        pastas = os.listdir(pasta_url)
+    except OSError:
+        return
+    for pasta in pastas:
+        caminho = os.path.join(pasta_url, pasta)
+        if caminho != pasta_versao:
+            shutil.rmtree(caminho, ignore_errors=True)
+
+
+# Função para ler um bloco gravado em disco
+def ler_bloco_disco(url, validador, bloco):
+    _, pasta_versao = pastas_blocos_disco(url, validador)
+    try:
+        with open(os.path.join(pasta_versao, f"{bloco}.bin"), "rb") as arquivo:
+            return arquivo.read()
+    except OSError:
+        return None
+
+
+# Função para gravar um bloco em disco
+def gravar_bloco_disco(url, validador, bloco, dados):
+    _, pasta_versao = pastas_blocos_disco(url, validador)
+    os.makedirs(pasta_versao, exist_ok=True)
+    arquivo_bloco = os.path.join(pasta_versao, f"{bloco}.bin")
+    sufixo = f".{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(arquivo_bloco + sufixo, "wb") as arquivo:
+        arquivo.write(dados)
+    os.replace(arquivo_bloco + sufixo, arquivo_bloco)
+
+
+# Função para guardar um bloco no cache LRU, descartando os mais antigos
+def guardar_bloco(chave, dados):
+    with _trava_blocos:
+        _blocos[chave] = dados
+        _blocos.move_to_end(chave)
+        while len(_blocos) > blocos_remotos_em_cache:
+            _blocos.popitem(last=False)
+
+
+# Função para buscar um bloco no cache LRU
+def buscar_bloco(chave):
+    with _trava_blocos:
+        dados = _blocos.get(chave)
+        if dados is not None:
+            _blocos.move_to_end(chave)
+        return dados
+
+
+# Erro de um arquivo remoto que mudou no servidor depois de aberto
+class ArquivoRemotoAlterado(ValueError):
+    pass
+
+
+# Arquivo remoto somente leitura que baixa apenas os blocos acessados, usando
+# requisições HTTP Range. Permite ao pyarrow ler o rodapé do Parquet e depois
+# só os column chunks dos row groups necessários. Quando o servidor informa
+# ETag / Last-Modified, os blocos também ficam em disco para a mesma versão do
+# arquivo, e o corpo inteiro já baixado por baixar() é reaproveitado.
+class ArquivoRemoto(io.RawIOBase):
+    def __init__(self, url):
+        self.url = url
+        self.posicao = 0
+        self.bytes_baixados = 0
+        resposta = obter_sessao().head(
+            url, allow_redirects=True, timeout=tempo_limite_remoto
+        )
+        resposta.raise_for_status()
+        if "Content-Length" not in resposta.headers:
+            raise ValueError(f"Servidor não informou o tamanho de {url}")
+        self.tamanho = int(resposta.headers["Content-Length"])
+        # Blocos de versões diferentes do arquivo nunca se misturam no cache
+        self.validador = resposta.headers.get("ETag") or resposta.headers.get(
+            "Last-Modified"
+        )
+        self.versao = self.validador or str(self.tamanho)
+        self.conteudo_local = None
+        if self.validador:
+            conteudo, metadados = ler_cache_url(url)
+            validadores = (metadados.get("etag"), metadados.get("last_modified"))
+            if conteudo is not None and self.validador in validadores:
+                self.conteudo_local = conteudo
+            limpar_blocos_antigos(url, self.validador)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.posicao
+
+    def seek(self, deslocamento, origem=io.SEEK_SET):
+        if origem == io.SEEK_SET:
+            self.posicao = deslocamento
+        elif origem == io.SEEK_CUR:
+            self.posicao += deslocamento
+        else:
+            self.posicao = self.tamanho + deslocamento
+        return self.posicao
+
+    def baixar_blocos(self, primeiro, ultimo):
+        inicio = primeiro * tamanho_bloco_remoto
+        fim = min((ultimo + 1) * tamanho_bloco_remoto, self.tamanho) - 1
+        cabecalhos = {"Range": f"bytes={inicio}-{fim}"}
+        if self.validador:
+            cabecalhos["If-Range"] = self.validador
+        resposta = obter_sessao().get(
+            self.url, headers=cabecalhos, timeout=tempo_limite_remoto
+        )
+        resposta.raise_for_status()
+        dados = resposta.content
+        self.bytes_baixados += len(dados)
+        if resposta.status_code == 200:
+            # Veio o arquivo todo: ou o servidor não aceita Range, ou o If-Range
+            # falhou porque o arquivo mudou. Blocos da versão nova não podem ser
+            # guardados sob a versão antiga nem misturados aos já lidos.
+            validador = resposta.headers.get("ETag") or resposta.headers.get(
+                "Last-Modified"
+            )
+            if validador != self.validador or len(dados) != self.tamanho:
+                raise ArquivoRemotoAlterado(f"{self.url} mudou durante a leitura")
+            inicio, primeiro = 0, 0
+            ultimo = (len(dados) - 1) // tamanho_bloco_remoto
+        elif not resposta.headers.get("Content-Range", "").endswith(f"/{self.tamanho}"):
+            raise ArquivoRemotoAlterado(f"{self.url} mudou durante a leitura")
+        for bloco in range(primeiro, ultimo + 1):
+            deslocamento = bloco * tamanho_bloco_remoto - inicio
+            dados_bloco = dados[deslocamento : deslocamento + tamanho_bloco_remoto]
+            guardar_bloco((self.url, self.versao, bloco), dados_bloco)
+            if self.validador:
+                gravar_bloco_disco(self.url, self.validador, bloco, dados_bloco)
+
+    # Bloco em memória ou, se não estiver, gravado em disco para esta versão
+    def bloco_em_cache(self, bloco):
+        dados = buscar_bloco((self.url, self.versao, bloco))
+        if dados is None and self.validador:
+            dados = ler_bloco_disco(self.url, self.validador, bloco)
+            if dados is not None:
+                guardar_bloco((self.url, self.versao, bloco), dados)
+        return dados
+
+    def ler_bloco(self, bloco):
+        dados = self.bloco_em_cache(bloco)
+        if dados is None:
+            self.baixar_blocos(bloco, bloco)
+            dados = self.bloco_em_cache(bloco)
+        return dados
+
+    def read(self, tamanho=-1):
+        if tamanho is None or tamanho < 0:
+            tamanho = self.tamanho - self.posicao
+        fim = min(self.posicao + tamanho, self.tamanho)
+        if fim <= self.posicao:
+            return b""
+        if self.conteudo_local is not None:
+            dados = self.conteudo_local[self.posicao : fim]
+            self.posicao = fim
+            return dados
+
+        # Baixar de uma vez os blocos seguidos que ainda não estão em cache
+        primeiro = self.posicao // tamanho_bloco_remoto
+        ultimo = (fim - 1) // tamanho_bloco_remoto
+        faltantes = [
+            bloco
+            for bloco in range(primeiro, ultimo + 1)
+            if self.bloco_em_cache(bloco) is None
+        ]
+        if faltantes:
+            self.baixar_blocos(faltantes[0], faltantes[-1])
+
+        partes = []
+        for bloco in range(primeiro, ultimo + 1):
+            dados = self.ler_bloco(bloco)
+            inicio_bloco = bloco * tamanho_bloco_remoto
+            partes.append(
+                dados[max(self.posicao - inicio_bloco, 0) : fim - inicio_bloco]
+            )
+        self.posicao = fim
+        return b"".join(partes)
+
+    def readinto(self, destino):
+        dados = self.read(len(destino))
+        destino[: len(dados)] = dados
+        return len(dados)
+
+
+# Função para escolher os row groups cujas estatísticas de Item podem conter
+# algum dos SKUs pedidos
+def row_groups_com_skus(metadados, skus):
+    if skus is None:
+        return list(range(metadados.num_row_groups))
+    itens = {int(sku) for sku in skus if str(sku).strip().isdigit()}
+    indice_item = metadados.schema.names.index("Item")
+    selecionados = []
+    for indice in range(metadados.num_row_groups):
+        estatisticas = metadados.row_group(indice).column(indice_item).statistics
+        if estatisticas is None or not estatisticas.has_min_max:
+            selecionados.append(indice)
+        elif any(estatisticas.min <= item <= estatisticas.max for item in itens):
+            selecionados.append(indice)
+    return selecionados
+
+
+# Função para ler de um Parquet remoto apenas as colunas e row groups
+# necessários, lendo primeiro o rodapé e depois só os trechos usados
+def ler_parquet_remoto(url, colunas=None, skus=None):
+    colunas_leitura = colunas
+    if skus is not None and colunas is not None and "Item" not in colunas:
+        colunas_leitura = [*colunas, "Item"]
+
+    # Se o arquivo mudar no meio da leitura, ela recomeça do rodapé da versão
+    # nova, com um ArquivoRemoto novo
+    for tentativa in range(tentativas_arquivo_alterado):
+        try:
+            with ArquivoRemoto(url) as arquivo:
+                parquet = pq.ParquetFile(arquivo)
+                row_groups = row_groups_com_skus(parquet.metadata, skus)
+                tabela = parquet.read_row_groups(row_groups, columns=colunas_leitura)
+            break
+        except ArquivoRemotoAlterado:
+            if tentativa == tentativas_arquivo_alterado - 1:
+                raise
+    df = tabela.to_pandas()
+
+    if skus is not None:
+        itens = [int(sku) for sku in skus if str(sku).strip().isdigit()]
+        df = df[df["Item"].isin(itens)].reset_index(drop=True)
+    if colunas_leitura is not colunas:
+        df = df[colunas]
+    return df
+
+
+# Função para carregar vários Parquets remotos em paralelo. Retorna os
+# DataFrames na ordem das URLs e a lista de (url, erro) das que falharam.
+# Com colunas ou SKUs, usa a leitura parcial via Range; sem filtros, baixa o
+# arquivo inteiro com requisição condicional.
+def carregar_parquets_remotos(urls, colunas=None, skus=None):
+    def carregar(url):
+        try:
+            if colunas is None and skus is None:
+                return carregar_parquet_remoto(url), None
+            return ler_parquet_remoto(url, colunas, skus), None
+        except Exception as e:
+            return None, e
+
+    with ThreadPoolExecutor(max_workers=conexoes_remotas) as executor:
+        resultados = list(executor.map(carregar, urls))
+
+    tabelas = [tabela for tabela, _ in resultados if tabela is not None]
+    erros = [(url, erro) for url, (_, erro) in zip(urls, resultados) if erro]
+    return tabelas, erros
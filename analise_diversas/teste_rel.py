@@ -1,10 +1,13 @@
+import os
+
 import pandas as pd
-from config.config_transform import (
+from .config.config_transform import (
     colunas_csv,
+    diretorio_arquivos,
     tipo_dados_csv,
 )
 
-arquivo = "../files/2024/desconto/2024.csv"
+arquivo = os.path.join(diretorio_arquivos, "2024", "desconto", "2024.csv")
 
 df = pd.read_csv(
     arquivo,
@@ -1,142 +1,1205 @@
+import argparse
+import glob
+import hashlib
+import json
 import logging
+import logging.handlers
+import multiprocessing
+import numpy as np
 import pandas as pd
 import os
+import shutil
+import pyarrow as pa
+import pyarrow.parquet as pq
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from datetime import date, datetime
+from openpyxl import load_workbook
 from tqdm import tqdm
-from config.config_transform import (
-    caminho_arquivos_csv,
-    caminho_arquivos_xlsx,
-    caminho_relatorio,
+
+# A configuração lê a pasta de arquivos (ANALISE_DIRETORIO_ARQUIVOS) ao ser
+# importada e dela deriva entradas, tratados, manifesto, dataset e caches. Como
+# script (python -m analise_diversas.transform), o --arquivos é lido antes dos
+# imports do projeto, para que todos esses caminhos (e os processos filhos, que
+# herdam a variável) sigam a pasta indicada.
+if __name__ == "__main__":
+    parser_pasta = argparse.ArgumentParser(add_help=False)
+    parser_pasta.add_argument("--arquivos")
+    pasta_arquivos = parser_pasta.parse_known_args()[0].arquivos
+    if pasta_arquivos:
+        os.environ["ANALISE_DIRETORIO_ARQUIVOS"] = os.path.abspath(pasta_arquivos)
+
+from .analise import (
+    calcular_metricas_promocoes,
+    como_texto,
+    estruturar_promocoes,
+    ranquear_promocoes,
+)
+from .instrumentacao import medir_etapa, handler_metricas, executar_com_perfil
+from .dataset_tratado import (
+    arquivo_metricas,
+    arquivo_ranking,
+    carregar_relatorio,
+    carregar_vendas,
+    diretorio_mes_dataset,
+    gravar_mes_dataset,
+    para_pandas,
+    versao_caminho,
+    versao_relatorio,
+)
+from .config.config_transform import (
+    diretorio_arquivos,
+    pasta_descontos,
+    pasta_cupons,
+    pasta_relatorios,
     diretorio_saida,
+    diretorio_dataset,
+    arquivo_manifesto,
+    formatos_saida,
+    compressao_parquet,
+    diretorio_cache_cupons,
+    diretorio_particoes_descontos,
+    tamanho_bloco_csv,
+    bits_chave_cupom,
+    data_base_chave_cupom,
+    merge_ordenado,
     colunas_csv,
     tipo_dados_csv,
     colunas_excel,
+    tipo_dados_excel_cache,
+    tipo_dados_excel,
+    formato_chaves_saida,
+    tamanho_lote_excel,
+    tamanho_grupo_linhas,
     colunas_relatorio,
     tipo_dados_relatorio,
     colunas_finais_relatorio,
 )
 
-# Configuração do logging para salvar em arquivo e console
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(message)s",
-    handlers=[
-        logging.FileHandler("processamento.log", encoding="utf-8"),  # Salva no arquivo
-        logging.StreamHandler(),  # Exibe no console
-    ],
-)
-# Garantir que o diretório de saída existe
-os.makedirs(diretorio_saida, exist_ok=True)
 
+# Configuração do logging para salvar em arquivo e console. Chamada por quem
+# executa o processamento, para que importar o módulo não crie arquivos.
+def configurar_log():
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(message)s",
+        handlers=[
+            logging.FileHandler("processamento.log", encoding="utf-8"),  # Arquivo
+            logging.StreamHandler(),  # Exibe no console
+            handler_metricas("processamento.jsonl"),  # Métricas das etapas em JSON
+        ],
+    )
 
-# Função para processar o único arquivo CSV
-def processar_arquivo_csv():
-    logging.info("Iniciando processamento do arquivo CSV.")
-    arquivo_csv = os.path.join(caminho_arquivos_csv, "2024.csv")
-    if not os.path.exists(arquivo_csv):
-        logging.warning("Arquivo CSV 2024 não encontrado. Finalizando...")
-        return
 
-    # Ler o arquivo CSV
-    df_csv = pd.read_csv(
-        arquivo_csv,
-        sep=";",
-        decimal=",",
-        usecols=colunas_csv,
-        # dtype=tipo_dados_csv,
-    )
+# Função para calcular o hash do conteúdo de um arquivo em blocos
+def calcular_hash_arquivo(caminho, tamanho_bloco=1024 * 1024):
+    sha256 = hashlib.sha256()
+    with open(caminho, "rb") as arquivo:
+        for bloco in iter(lambda: arquivo.read(tamanho_bloco), b""):
+            sha256.update(bloco)
+    return sha256.hexdigest()
+
+
+# Função para obter tamanho, mtime e hash de um arquivo de entrada
+def assinatura_arquivo(caminho, anterior=None):
+    info = os.stat(caminho)
+    assinatura = {"tamanho": info.st_size, "mtime": info.st_mtime_ns}
+
+    # Se tamanho e mtime não mudaram, reaproveita o hash já calculado
+    if (
+        anterior
+        and anterior.get("tamanho") == assinatura["tamanho"]
+        and anterior.get("mtime") == assinatura["mtime"]
+    ):
+        assinatura["hash"] = anterior["hash"]
+    else:
+        assinatura["hash"] = calcular_hash_arquivo(caminho)
+    return assinatura
+
+
+# Função para carregar o manifesto da última execução
+def carregar_manifesto():
+    if not os.path.exists(arquivo_manifesto):
+        return {"descontos": {}, "meses": {}}
+    try:
+        with open(arquivo_manifesto, encoding="utf-8") as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        logging.warning("Manifesto inválido. Todos os meses serão reprocessados.")
+        return {"descontos": {}, "meses": {}}
+
+
+# Função para salvar o manifesto de forma atômica
+def salvar_manifesto(manifesto):
+    os.makedirs(os.path.dirname(arquivo_manifesto), exist_ok=True)
+    arquivo_temporario = f"{arquivo_manifesto}.tmp"
+    with open(arquivo_temporario, "w", encoding="utf-8") as arquivo:
+        json.dump(manifesto, arquivo, indent=2, ensure_ascii=False)
+    os.replace(arquivo_temporario, arquivo_manifesto)
+
+
+# Função para verificar se um mês precisa ser reprocessado
+def mes_desatualizado(entrada_mes, assinatura_xlsx, hash_csv, saidas):
+    if not entrada_mes:
+        return True
+    if entrada_mes.get("xlsx", {}).get("hash") != assinatura_xlsx["hash"]:
+        return True
+    if entrada_mes.get("csv_hash") != hash_csv:
+        return True
+    return not all(os.path.exists(saida) for saida in saidas)
+
+
+# Função para listar as saídas de um mês (arquivos por formato e partição do
+# dataset)
+def saidas_mes(ano_mes):
+    return (*arquivos_saida_mes(ano_mes).values(), diretorio_mes_dataset(ano_mes))
 
+
+# Função para validar os formatos de saída configurados
+def validar_formatos_saida():
+    invalidos = [f for f in formatos_saida if f not in ("parquet", "csv")]
+    if invalidos:
+        raise ValueError(f"Formatos de saída inválidos: {', '.join(invalidos)}")
+
+
+# Função para montar os caminhos de saída de um mês, por formato configurado
+def arquivos_saida_mes(ano_mes):
+    return {
+        formato: os.path.join(diretorio_saida, f"{ano_mes}_tratado.{formato}")
+        for formato in formatos_saida
+    }
+
+
+# Função para gravar um DataFrame no formato pedido. No Parquet, ordenar_por
+# agrupa os valores em row groups com estatísticas seletivas para leitura parcial
+def gravar_saida(df, caminho, formato, colunas=None, ordenar_por=None):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    if formato == "csv":
+        df.to_csv(caminho, index=False, encoding="utf-8", sep=";", columns=colunas)
+    else:
+        if colunas is not None:
+            df = df[colunas]
+        if ordenar_por is not None:
+            df = df.sort_values(ordenar_por, kind="stable")
+        df.to_parquet(
+            caminho,
+            index=False,
+            compression=compressao_parquet,
+            row_group_size=tamanho_grupo_linhas,
+        )
+
+
+# Função para validar e aplicar o schema de tipos a um DataFrame carregado
+def aplicar_schema(df, tipos, origem):
+    faltantes = [coluna for coluna in tipos if coluna not in df.columns]
+    if faltantes:
+        raise ValueError(
+            f"{origem}: colunas obrigatórias ausentes: {', '.join(faltantes)}"
+        )
+    for coluna, tipo in tipos.items():
+        if str(df[coluna].dtype) == tipo:
+            continue
+        try:
+            df[coluna] = df[coluna].astype(tipo)
+        except (ValueError, TypeError, OverflowError) as e:
+            raise ValueError(
+                f"{origem}: coluna '{coluna}' incompatível com o tipo {tipo}: {e}"
+            ) from e
+    return df
+
+
+# Função para padronizar as chaves do CSV de descontos (executada uma única vez)
+def normalizar_descontos(df_csv):
     df_csv["Data"] = pd.to_datetime(df_csv["Data"], format="%d/%m/%Y")
+    return df_csv
+
+
+# Função para padronizar as chaves de um arquivo Excel de cupons
+def normalizar_cupons(df_xlsx):
+    df_xlsx["Data"] = pd.to_datetime(df_xlsx["Data"], format="%d/%m/%y")
+    return df_xlsx
+
+
+# Função para formatar as chaves inteiras como texto, igual aos arquivos de saída
+def formatar_chaves_saida(df):
+    for coluna, digitos in formato_chaves_saida.items():
+        if coluna in df.columns:
+            df[coluna] = como_texto(df[coluna]).str.zfill(digitos)
+    return df
+
+
+# Função para dividir os descontos em partições mensais indexadas por ano_mes
+def particionar_por_mes(df_csv):
+    chave_mes = df_csv["Data"].dt.strftime("%Y-%m")
+    return {ano_mes: particao for ano_mes, particao in df_csv.groupby(chave_mes)}
+
+
+# Função para obter os hashes das linhas de um DataFrame, na ordem das linhas.
+# Não dependem do índice nem das categorias, então o resultado é o mesmo com o
+# CSV lido inteiro ou em blocos.
+def hash_linhas(df):
+    return pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()
+
+
+# Função para ler o CSV de descontos com o schema compacto (inteiro ou em blocos)
+def ler_csv_descontos(arquivo_csv, tamanho_bloco=None):
+    try:
+        return pd.read_csv(
+            arquivo_csv,
+            sep=";",
+            decimal=",",
+            usecols=colunas_csv,
+            dtype=tipo_dados_csv,
+            chunksize=tamanho_bloco,
+        )
+    except (ValueError, OverflowError) as e:
+        raise ValueError(f"{arquivo_csv}: dados fora do schema esperado: {e}") from e
+
 
-    # Obter todos os arquivos Excel disponíveis
-    arquivos_xlsx = [
-        os.path.join(caminho_arquivos_xlsx, f)
-        for f in os.listdir(caminho_arquivos_xlsx)
-        if f.startswith("CUPOM_") and f.endswith(".xlsx")
+# Função para carregar em memória todos os CSV de descontos de um ano,
+# particionados por mês
+def particionar_descontos_em_memoria(arquivos_csv, ano=None):
+    with medir_etapa("leitura_descontos", ano) as etapa:
+        partes = [
+            aplicar_schema(ler_csv_descontos(arquivo_csv), tipo_dados_csv, arquivo_csv)
+            for arquivo_csv in arquivos_csv
+        ]
+        df_csv = partes[0] if len(partes) == 1 else pd.concat(partes, ignore_index=True)
+        etapa["linhas"] = len(df_csv)
+
+    # Padronizar as chaves uma única vez e particionar por mês
+    with medir_etapa("normalizacao_descontos", ano) as etapa:
+        df_csv = normalizar_descontos(df_csv)
+        particoes = particionar_por_mes(df_csv)
+        hashes = {
+            ano_mes: hashlib.sha256(hash_linhas(particao)).hexdigest()
+            for ano_mes, particao in particoes.items()
+        }
+        etapa["linhas"] = len(df_csv)
+    return particoes, df_csv.iloc[0:0], hashes
+
+
+# Função para ler em blocos os CSV de descontos de um ano, gravando partições
+# mensais em disco (em uma pasta própria do ano, para que os anos possam ser
+# lidos ao mesmo tempo) e o hash das linhas de cada mês
+def particionar_descontos_em_disco(arquivos_csv, tamanho_bloco, ano=None):
+    diretorio_particoes = os.path.join(diretorio_particoes_descontos, ano or "")
+    shutil.rmtree(diretorio_particoes, ignore_errors=True)
+    particoes = {}
+    hashes = {}
+    vazio = None
+    with medir_etapa("leitura_descontos", ano) as etapa:
+        etapa["linhas"] = 0
+        for numero_arquivo, arquivo_csv in enumerate(arquivos_csv):
+            with ler_csv_descontos(arquivo_csv, tamanho_bloco) as blocos:
+                for numero_bloco, bloco in enumerate(blocos):
+                    etapa["linhas"] += len(bloco)
+                    try:
+                        bloco = aplicar_schema(bloco, tipo_dados_csv, arquivo_csv)
+                    except ValueError as e:
+                        raise ValueError(f"Bloco {numero_bloco}: {e}") from e
+                    bloco = normalizar_descontos(bloco)
+                    if vazio is None:
+                        vazio = bloco.iloc[0:0]
+
+                    for ano_mes, parte in particionar_por_mes(bloco).items():
+                        diretorio_mes = os.path.join(diretorio_particoes, ano_mes)
+                        os.makedirs(diretorio_mes, exist_ok=True)
+                        parte.to_parquet(
+                            os.path.join(
+                                diretorio_mes,
+                                f"parte-{numero_arquivo:03d}-{numero_bloco:05d}.parquet",
+                            ),
+                            index=False,
+                        )
+                        particoes[ano_mes] = diretorio_mes
+                        hashes.setdefault(ano_mes, hashlib.sha256()).update(
+                            hash_linhas(parte)
+                        )
+    logging.info(
+        f"CSV de descontos{f' de {ano}' if ano else ''} dividido em "
+        f"{len(particoes)} partições mensais."
+    )
+    return (
+        particoes,
+        vazio,
+        {ano_mes: sha256.hexdigest() for ano_mes, sha256 in hashes.items()},
+    )
+
+
+# Função para obter o DataFrame de uma partição (em memória ou gravada em disco)
+def carregar_particao(particao):
+    if isinstance(particao, pd.DataFrame):
+        return particao
+    df = pd.read_parquet(particao)
+    return aplicar_schema(df, tipo_dados_csv | {"Data": "datetime64[ns]"}, particao)
+
+
+# Função para listar os meses (AAAA-MM) presentes em uma coluna de datas
+def meses_das_datas(datas):
+    return sorted(datas.dt.strftime("%Y-%m").dropna().unique())
+
+
+# Função para selecionar as partições de desconto dos meses presentes nos cupons
+# (cada mês pode ter partições de mais de um ano)
+def descontos_do_mes(particoes, df_xlsx, vazio):
+    selecionadas = [
+        carregar_particao(particao)
+        for mes in meses_das_datas(df_xlsx["Data"])
+        for particao in particoes.get(mes, [])
     ]
+    if len(selecionadas) == 1:
+        return selecionadas[0]
+    if not selecionadas:
+        return vazio
+    return pd.concat(selecionadas)
+
+
+# Funções para converter os valores brutos das células do Excel
+def converter_texto(valor):
+    if valor is None:
+        return None
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+
+def converter_inteiro(valor):
+    if valor is None or valor == "":
+        return None
+    return int(valor)
+
+
+def converter_decimal(valor):
+    if valor is None or valor == "":
+        return None
+    if isinstance(valor, str):
+        return float(valor.strip().replace(",", "."))
+    return float(valor)
+
+
+def converter_data(valor):
+    if valor is None or valor == "":
+        return None
+    if isinstance(valor, datetime):
+        return valor
+    if isinstance(valor, date):
+        return datetime(valor.year, valor.month, valor.day)
+    return datetime.strptime(str(valor).strip(), "%d/%m/%y")
+
+
+conversores_excel = {
+    "string": converter_texto,
+    "int16": converter_inteiro,
+    "int32": converter_inteiro,
+    "int64": converter_inteiro,
+    "float64": converter_decimal,
+    "timestamp[ns]": converter_data,
+}
+
+
+# Função para montar o schema Arrow do cache a partir da configuração
+def schema_cache_cupons(metadados=None):
+    return pa.schema(
+        [
+            pa.field(coluna, pa.type_for_alias(tipo_dados_excel_cache[coluna]))
+            for coluna in colunas_excel
+        ],
+        metadata=metadados,
+    )
+
+
+# Função para montar o caminho do cache colunar de um arquivo Excel
+def arquivo_cache_cupons(arquivo_xlsx):
+    nome = os.path.splitext(os.path.basename(arquivo_xlsx))[0]
+    return os.path.join(diretorio_cache_cupons, f"{nome}.parquet")
+
+
+# Função para ler a assinatura do Excel gravada no cache, se existir
+def assinatura_do_cache(arquivo_cache):
+    if not os.path.exists(arquivo_cache):
+        return None
+    try:
+        metadados = pq.read_schema(arquivo_cache).metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+    if b"assinatura_xlsx" not in metadados:
+        return None
+    # Um cache gerado com outro schema de tipos é descartado
+    if metadados.get(b"schema") != json.dumps(tipo_dados_excel_cache).encode():
+        return None
+    return json.loads(metadados[b"assinatura_xlsx"])
+
+
+# Função para converter um Excel em Parquet lendo as linhas em modo streaming
+def converter_excel_para_parquet(arquivo_xlsx, arquivo_cache, assinatura):
+    os.makedirs(diretorio_cache_cupons, exist_ok=True)
+    schema = schema_cache_cupons(
+        {
+            "assinatura_xlsx": json.dumps(assinatura),
+            "schema": json.dumps(tipo_dados_excel_cache),
+            "origem": arquivo_xlsx,
+        }
+    )
+    conversores = [
+        conversores_excel[tipo_dados_excel_cache[coluna]] for coluna in colunas_excel
+    ]
+
+    pasta = load_workbook(arquivo_xlsx, read_only=True, data_only=True)
+    arquivo_temporario = f"{arquivo_cache}.tmp"
+    try:
+        linhas = pasta.worksheets[0].iter_rows(values_only=True)
+        cabecalho = [str(c).strip() if c is not None else "" for c in next(linhas)]
+        faltantes = [coluna for coluna in colunas_excel if coluna not in cabecalho]
+        if faltantes:
+            raise ValueError(
+                f"{arquivo_xlsx}: colunas ausentes no Excel: {', '.join(faltantes)}"
+            )
+        indices = [cabecalho.index(coluna) for coluna in colunas_excel]
+
+        with pq.ParquetWriter(arquivo_temporario, schema) as escritor:
+
+            def gravar_lote(lote):
+                colunas = [
+                    pa.array([converter(linha[i]) for linha in lote], type=campo.type)
+                    for i, converter, campo in zip(indices, conversores, schema)
+                ]
+                escritor.write_table(pa.Table.from_arrays(colunas, schema=schema))
+
+            lote = []
+            for linha in linhas:
+                if all(valor is None for valor in linha):
+                    continue
+                lote.append(linha)
+                if len(lote) >= tamanho_lote_excel:
+                    gravar_lote(lote)
+                    lote = []
+            if lote:
+                gravar_lote(lote)
+        os.replace(arquivo_temporario, arquivo_cache)
+    finally:
+        pasta.close()
+        if os.path.exists(arquivo_temporario):
+            os.remove(arquivo_temporario)
+
+
+# Função para gerar o cache colunar de um Excel quando ele não existe ou o Excel
+# mudou. Retorna o caminho do cache.
+def atualizar_cache_cupons(arquivo_xlsx):
+    arquivo_cache = arquivo_cache_cupons(arquivo_xlsx)
+    assinatura_anterior = assinatura_do_cache(arquivo_cache)
+    assinatura = assinatura_arquivo(arquivo_xlsx, assinatura_anterior)
+
+    if assinatura_anterior is None or assinatura_anterior["hash"] != assinatura["hash"]:
+        logging.info(f"Gerando cache colunar de {os.path.basename(arquivo_xlsx)}.")
+        converter_excel_para_parquet(arquivo_xlsx, arquivo_cache, assinatura)
+    return arquivo_cache
+
+
+# Função para ler os cupons de um Excel, usando o cache colunar quando válido
+def ler_cupons(arquivo_xlsx):
+    arquivo_cache = atualizar_cache_cupons(arquivo_xlsx)
+    df_xlsx = para_pandas(pq.read_table(arquivo_cache, columns=colunas_excel))
+    return aplicar_schema(df_xlsx, tipo_dados_excel, arquivo_xlsx)
+
+
+# Função para listar os meses das datas dos cupons de um Excel, lendo apenas a
+# coluna Data do cache colunar (gerado aqui, se preciso)
+def meses_dos_cupons(arquivo_xlsx):
+    arquivo_cache = atualizar_cache_cupons(arquivo_xlsx)
+    datas = para_pandas(pq.read_table(arquivo_cache, columns=["Data"]))["Data"]
+    return meses_das_datas(datas)
+
 
-    for arquivo_xlsx in tqdm(arquivos_xlsx, desc="Processando arquivos Excel"):
-        ano_mes = os.path.basename(arquivo_xlsx).split("_")[1].split(".")[0]
+# Função para redirecionar o log dos processos filhos para a fila do processo principal
+def configurar_log_worker(fila_log):
+    raiz = logging.getLogger()
+    for handler in list(raiz.handlers):
+        raiz.removeHandler(handler)
+    raiz.addHandler(logging.handlers.QueueHandler(fila_log))
+    raiz.setLevel(logging.INFO)
 
-        # Ler o arquivo Excel
-        df_xlsx = pd.read_excel(arquivo_xlsx, decimal=",", usecols=colunas_excel)
 
-        # Padronizar valores para o merge
-        df_csv["Docum"] = df_csv["Docum"].astype(str).str.strip()
-        df_csv["CX"] = df_csv["CX"].astype(str).str.strip()
-        df_csv["Lj"] = df_csv["Lj"].astype(str).str.zfill(2)
-        df_csv["Data"] = pd.to_datetime(df_csv["Data"], format="%d/%m/%y")
+# Chaves do cupom em cada lado do merge (descontos x cupons)
+chaves_descontos = ["Docum", "CX", "Lj", "Data"]
+chaves_cupons = ["Num.Cupom", "PDV", "Loja", "Data"]
 
-        df_xlsx["Num.Cupom"] = df_xlsx["Num.Cupom"].astype(str).str.strip()
-        df_xlsx["PDV"] = df_xlsx["PDV"].astype(str).str.strip()
-        df_xlsx["Loja"] = df_xlsx["Loja"].astype(str).str.zfill(2)
-        df_xlsx["Data"] = pd.to_datetime(df_xlsx["Data"], format="%d/%m/%y")
 
-        # Realizar o merge
-        df_combinado = pd.merge(
-            df_csv,
+# Função para descartar, com um aviso, as linhas com alguma chave do cupom em
+# branco, que não identificam um cupom
+def descartar_chaves_nulas(df, chaves, origem):
+    nulas = df[chaves].isna().any(axis=1)
+    if nulas.any():
+        logging.warning(
+            f"{origem}: {int(nulas.sum())} linhas com chave do cupom em branco "
+            "descartadas."
+        )
+        df = df[~nulas]
+    return df
+
+
+# Função para empacotar documento, caixa, loja e dia em uma única chave int64
+# (as chaves nulas já foram descartadas). Retorna None quando algum valor não
+# cabe nos bits reservados, pois nesse caso cupons diferentes poderiam colidir
+# na mesma chave.
+def chave_cupom(documento, caixa, loja, data):
+    if sum(bits_chave_cupom.values()) > 63:
+        raise ValueError("bits_chave_cupom precisa somar no máximo 63 bits.")
+    dias = (
+        data.to_numpy(dtype="datetime64[ns]")
+        - np.datetime64(data_base_chave_cupom, "ns")
+    ) // np.timedelta64(1, "D")
+
+    chave = np.zeros(len(documento), dtype=np.int64)
+    for campo, valores in (
+        ("documento", documento),
+        ("caixa", caixa),
+        ("loja", loja),
+        ("dia", dias),
+    ):
+        valores = np.asarray(valores, dtype=np.int64)
+        bits = bits_chave_cupom[campo]
+        if len(valores) and (valores.min() < 0 or valores.max() >= 1 << bits):
+            return None
+        chave = (chave << bits) | valores
+    return chave
+
+
+# Função para juntar duas listas de chaves por ordenação: ordena a direita (se
+# ainda não estiver ordenada) e localiza as faixas iguais com searchsorted.
+# Devolve as posições combinadas na ordem da esquerda, como o merge do pandas.
+def juntar_ordenado(chave_esquerda, chave_direita):
+    if np.all(chave_direita[:-1] <= chave_direita[1:]):
+        ordem = np.arange(len(chave_direita))
+    else:
+        ordem = np.argsort(chave_direita, kind="stable")
+    ordenadas = chave_direita[ordem]
+    inicio = np.searchsorted(ordenadas, chave_esquerda, side="left")
+    contagens = np.searchsorted(ordenadas, chave_esquerda, side="right") - inicio
+
+    indice_esquerda = np.repeat(np.arange(len(chave_esquerda)), contagens)
+    deslocamentos = np.arange(contagens.sum()) - np.repeat(
+        np.cumsum(contagens) - contagens, contagens
+    )
+    indice_direita = ordem[np.repeat(inicio, contagens) + deslocamentos]
+    return indice_esquerda, indice_direita
+
+
+# Função para juntar duas listas de chaves por hash. No caso comum (um registro
+# de desconto por cupom) basta localizar cada item na tabela hash dos descontos;
+# com chaves repetidas na esquerda, usa o merge do pandas sobre as chaves.
+def juntar_por_hash(chave_esquerda, chave_direita):
+    indice = pd.Index(chave_esquerda)
+    if not indice.is_unique:
+        pares = pd.merge(
+            pd.DataFrame({"chave": chave_esquerda}).reset_index(names="esquerda"),
+            pd.DataFrame({"chave": chave_direita}).reset_index(names="direita"),
+            on="chave",
+            how="inner",
+        )
+        return pares["esquerda"].to_numpy(), pares["direita"].to_numpy()
+
+    posicoes = indice.get_indexer(chave_direita)
+    encontrados = np.flatnonzero(posicoes >= 0)
+    indice_direita = encontrados[np.argsort(posicoes[encontrados], kind="stable")]
+    return posicoes[indice_direita], indice_direita
+
+
+# Função para combinar descontos e cupons pela chave inteira do cupom, com o
+# mesmo resultado do merge pelas quatro colunas (usado se a chave não couber)
+def combinar_descontos_cupons(df_descontos, df_xlsx, ordenado=False):
+    chave_descontos = chave_cupom(*(df_descontos[c] for c in chaves_descontos))
+    chave_xlsx = chave_cupom(*(df_xlsx[c] for c in chaves_cupons))
+    if chave_descontos is None or chave_xlsx is None:
+        logging.warning(
+            "Chave do cupom fora dos limites de bits_chave_cupom. "
+            "Usando o merge pelas quatro colunas."
+        )
+        return pd.merge(
+            df_descontos,
             df_xlsx,
-            left_on=["Docum", "CX", "Lj", "Data"],
-            right_on=["Num.Cupom", "PDV", "Loja", "Data"],
+            left_on=chaves_descontos,
+            right_on=chaves_cupons,
             how="inner",
         )
 
-        # Contar valores únicos na coluna 'Docum'
-        valores_unicos_docum = df_combinado["Docum"].nunique()
-        logging.info(f"{ano_mes}: {valores_unicos_docum} Cupons.")
+    juntar = juntar_ordenado if ordenado else juntar_por_hash
+    indice_descontos, indice_xlsx = juntar(chave_descontos, chave_xlsx)
+
+    # A data já está na chave; fica apenas a coluna do lado dos descontos
+    esquerda = df_descontos.take(indice_descontos)
+    direita = df_xlsx.take(indice_xlsx)
+    del direita["Data"]
+    esquerda.index = direita.index = pd.RangeIndex(len(indice_descontos))
+    return pd.concat([esquerda, direita], axis=1)
+
 
-        # Salvar os resultados
-        arquivo_saida_csv = os.path.join(diretorio_saida, f"{ano_mes}_tratado.csv")
-        arquivo_saida_parquet = os.path.join(
-            diretorio_saida, f"{ano_mes}_tratado.parquet"
+# Função para ler, padronizar, combinar e salvar um único mês. Cada etapa é
+# medida e registrada no log legível e no processamento.jsonl.
+def processar_mes(ano_mes, arquivo_xlsx, particoes, vazio):
+    # Ler o arquivo Excel (via cache colunar)
+    with medir_etapa("leitura", ano_mes) as etapa:
+        df_xlsx = ler_cupons(arquivo_xlsx)
+        etapa["linhas"] = len(df_xlsx)
+
+    # Padronizar valores para o merge
+    with medir_etapa("normalizacao", ano_mes) as etapa:
+        df_xlsx = normalizar_cupons(df_xlsx)
+        etapa["linhas"] = len(df_xlsx)
+
+    # Realizar o merge apenas com a partição do mesmo mês
+    with medir_etapa("merge", ano_mes) as etapa:
+        df_combinado = combinar_descontos_cupons(
+            descartar_chaves_nulas(
+                descontos_do_mes(particoes, df_xlsx, vazio),
+                chaves_descontos,
+                f"{ano_mes}: descontos",
+            ),
+            descartar_chaves_nulas(df_xlsx, chaves_cupons, f"{ano_mes}: cupons"),
+            ordenado=merge_ordenado,
         )
+        etapa["linhas"] = len(df_combinado)
 
-        df_combinado.to_csv(arquivo_saida_csv, index=False, encoding="utf-8", sep=";")
-        df_combinado.to_parquet(arquivo_saida_parquet, index=False)
-    logging.info("Processamento do arquivo CSV concluído.")
+    # Contar valores únicos na coluna 'Docum'
+    valores_unicos_docum = df_combinado["Docum"].nunique()
+    logging.info(f"{ano_mes}: {valores_unicos_docum} Cupons.")
 
+    # Manter as chaves no mesmo formato texto dos arquivos já publicados
+    # e salvar os resultados nos formatos configurados
+    with medir_etapa("gravacao", ano_mes) as etapa:
+        df_combinado = formatar_chaves_saida(df_combinado)
+        for formato, arquivo_saida in arquivos_saida_mes(ano_mes).items():
+            gravar_saida(df_combinado, arquivo_saida, formato, ordenar_por="Item")
+        gravar_mes_dataset(df_combinado, ano_mes)
+        etapa["linhas"] = len(df_combinado)
+    return ano_mes
 
-def processar_relatorio():
-    logging.info("Iniciando processamento do relatório.")
-    df = pd.read_csv(
-        caminho_relatorio,
+
+# Função para localizar as entradas de cada ano em diretorio_arquivos/AAAA: os
+# CSV de descontos, os Excel de cupons (CUPOM_AAAA-MM.xlsx) e os relatórios
+def descobrir_anos(anos=None):
+    entradas = {}
+    if not os.path.isdir(diretorio_arquivos):
+        return entradas
+    for ano in sorted(os.listdir(diretorio_arquivos)):
+        pasta_ano = os.path.join(diretorio_arquivos, ano)
+        if not (len(ano) == 4 and ano.isdigit() and os.path.isdir(pasta_ano)):
+            continue
+        if anos and ano not in anos:
+            continue
+        entradas[ano] = {
+            "csv": sorted(glob.glob(os.path.join(pasta_ano, pasta_descontos, "*.csv"))),
+            "xlsx": sorted(
+                glob.glob(os.path.join(pasta_ano, pasta_cupons, "CUPOM_*.xlsx"))
+            ),
+            "relatorios": sorted(
+                glob.glob(os.path.join(pasta_ano, pasta_relatorios, "*.csv"))
+            ),
+        }
+    return entradas
+
+
+# Função para montar um único índice com os meses de todos os anos: cada mês
+# aponta para o seu Excel de cupons e para os anos cujos descontos ele usa. O
+# Excel de janeiro pode trazer cupons do fim de dezembro, então janeiro usa
+# também os descontos do ano anterior, quando existem.
+def indexar_meses(entradas):
+    indice = {}
+    for ano, arquivos in entradas.items():
+        for arquivo_xlsx in arquivos["xlsx"]:
+            ano_mes = os.path.basename(arquivo_xlsx).split("_")[1].split(".")[0]
+            if ano_mes in indice:
+                raise ValueError(
+                    f"Mês {ano_mes} repetido: {indice[ano_mes]['xlsx']} e {arquivo_xlsx}"
+                )
+            ano_anterior = str(int(ano) - 1)
+            anos = (ano,)
+            if ano_mes.endswith("-01") and ano_anterior in entradas:
+                anos = (ano_anterior, ano)
+            indice[ano_mes] = {"ano": ano, "anos": anos, "xlsx": arquivo_xlsx}
+    return dict(sorted(indice.items()))
+
+
+# Função para combinar os hashes dos CSV de descontos de um ano. Com um único
+# arquivo, vale o hash do próprio arquivo, como nos manifestos anteriores.
+def hash_descontos(assinaturas):
+    hashes = sorted(assinatura["hash"] for assinatura in assinaturas)
+    if len(hashes) == 1:
+        return hashes[0]
+    return hashlib.sha256("".join(hashes).encode()).hexdigest()
+
+
+# Função para ler os descontos dos anos indicados. Com mais de um worker, os
+# anos são lidos ao mesmo tempo (a leitura do CSV libera o GIL na maior parte).
+def particionar_descontos_dos_anos(arquivos_por_ano, workers, streaming):
+    def ler(ano):
+        if streaming:
+            return particionar_descontos_em_disco(
+                arquivos_por_ano[ano], tamanho_bloco_csv, ano
+            )
+        return particionar_descontos_em_memoria(arquivos_por_ano[ano], ano)
+
+    if workers > 1 and len(arquivos_por_ano) > 1:
+        with ThreadPoolExecutor(
+            max_workers=min(workers, len(arquivos_por_ano))
+        ) as executor:
+            return dict(zip(arquivos_por_ano, executor.map(ler, arquivos_por_ano)))
+    return {ano: ler(ano) for ano in arquivos_por_ano}
+
+
+# Função para reunir as partições de descontos dos anos usados por um mês (um
+# mesmo mês pode estar no CSV de mais de um ano). O DataFrame vazio é o do ano
+# do próprio mês, o último da lista.
+def descontos_dos_anos(descontos, anos):
+    particoes = {}
+    for ano in anos:
+        for ano_mes, particao in descontos[ano][0].items():
+            particoes.setdefault(ano_mes, []).append(particao)
+    return particoes, descontos[anos[-1]][1]
+
+
+# Função para calcular o hash das entradas de um mês: as linhas de desconto dos
+# meses presentes nos cupons do Excel (de todos os anos usados pelo mês) e a
+# assinatura do Excel. Linhas novas em outros meses do CSV não alteram o hash.
+def hash_entradas_mes(assinatura_xlsx, arquivo_xlsx, descontos, anos):
+    sha256 = hashlib.sha256(assinatura_xlsx["hash"].encode())
+    for mes in meses_dos_cupons(arquivo_xlsx):
+        for ano in anos:
+            if mes in descontos[ano][2]:
+                sha256.update(f"{ano}/{mes}:{descontos[ano][2][mes]}".encode())
+    return sha256.hexdigest()
+
+
+# Função para verificar se um mês com o CSV de descontos alterado pode ser
+# mantido: o Excel e as saídas são os mesmos e as suas linhas de desconto não
+# mudaram. Nesse caso o manifesto do mês passa a apontar para o CSV atual.
+def mes_inalterado(entrada_mes, pendente, descontos):
+    ano_mes, anos, arquivo_xlsx, assinatura_xlsx, hash_csv = pendente
+    if not entrada_mes or "hash_entradas" not in entrada_mes:
+        return False
+    if entrada_mes["xlsx"]["hash"] != assinatura_xlsx["hash"]:
+        return False
+    if not all(os.path.exists(saida) for saida in saidas_mes(ano_mes)):
+        return False
+    if entrada_mes["hash_entradas"] != hash_entradas_mes(
+        assinatura_xlsx, arquivo_xlsx, descontos, anos
+    ):
+        return False
+    entrada_mes["xlsx"] = assinatura_xlsx
+    entrada_mes["csv_hash"] = hash_csv
+    return True
+
+
+# Função para executar os meses pendentes em um pool de processos
+def processar_meses_em_paralelo(pendentes, descontos, workers):
+    gerenciador = multiprocessing.Manager()
+    fila_log = gerenciador.Queue()
+    ouvinte = logging.handlers.QueueListener(
+        fila_log, *logging.getLogger().handlers, respect_handler_level=True
+    )
+    ouvinte.start()
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=configurar_log_worker,
+            initargs=(fila_log,),
+        ) as executor:
+            # Os meses de todos os anos dividem o mesmo pool. Cada processo
+            # primeiro lista os meses das datas do seu Excel (gerando o cache
+            # colunar) e depois recebe apenas as partições desses meses.
+            listagens = {
+                executor.submit(meses_dos_cupons, pendente[2]): pendente
+                for pendente in pendentes
+            }
+            processamentos = {}
+            while listagens or processamentos:
+                concluidos, _ = wait(
+                    [*listagens, *processamentos], return_when=FIRST_COMPLETED
+                )
+                for futuro in concluidos:
+                    if futuro in processamentos:
+                        yield processamentos.pop(futuro), futuro.exception()
+                        continue
+                    ano_mes, anos, arquivo_xlsx, _, _ = listagens.pop(futuro)
+                    if futuro.exception() is not None:
+                        yield ano_mes, futuro.exception()
+                        continue
+                    particoes, vazio = descontos_dos_anos(descontos, anos)
+                    proximo = executor.submit(
+                        processar_mes,
+                        ano_mes,
+                        arquivo_xlsx,
+                        {
+                            mes: particoes[mes]
+                            for mes in futuro.result()
+                            if mes in particoes
+                        },
+                        vazio,
+                    )
+                    processamentos[proximo] = ano_mes
+    finally:
+        ouvinte.stop()
+        gerenciador.shutdown()
+
+
+# Função para executar os meses pendentes sequencialmente no processo atual.
+# O mês indicado em mes_perfil é executado sob o cProfile.
+def processar_meses_em_sequencia(pendentes, descontos, mes_perfil=None):
+    for ano_mes, anos, arquivo_xlsx, _, _ in pendentes:
+        particoes, vazio = descontos_dos_anos(descontos, anos)
+        try:
+            if ano_mes == mes_perfil:
+                executar_com_perfil(
+                    f"perfil_{ano_mes}.prof",
+                    processar_mes,
+                    ano_mes,
+                    arquivo_xlsx,
+                    particoes,
+                    vazio,
+                )
+            else:
+                processar_mes(ano_mes, arquivo_xlsx, particoes, vazio)
+            yield ano_mes, None
+        except Exception as e:
+            yield ano_mes, e
+
+
+# Função para processar os CSV de descontos e os Excel de cupons de todos os
+# anos encontrados em diretorio_arquivos (ou apenas dos anos indicados). Com
+# perfil="AAAA-MM", apenas esse mês é reprocessado, no processo atual e sob o
+# cProfile.
+def processar_arquivo_csv(
+    forcar=False,
+    workers=1,
+    streaming=False,
+    perfil=None,
+    anos=None,
+):
+    logging.info("Iniciando processamento dos arquivos CSV.")
+    validar_formatos_saida()
+    entradas = descobrir_anos()
+    for ano, arquivos in entradas.items():
+        if arquivos["xlsx"] and not arquivos["csv"]:
+            logging.warning(f"Arquivo CSV de {ano} não encontrado. Ano ignorado.")
+    entradas = {ano: arquivos for ano, arquivos in entradas.items() if arquivos["csv"]}
+    if not entradas:
+        logging.warning(
+            f"Nenhum arquivo CSV encontrado em {diretorio_arquivos}. Finalizando..."
+        )
+        return
+
+    # Com forcar, descarta apenas as entradas dos anos selecionados (os demais
+    # anos continuam disponíveis como descontos do ano anterior)
+    indice_meses = indexar_meses(entradas)
+    if anos:
+        indice_meses = {
+            ano_mes: mes for ano_mes, mes in indice_meses.items() if mes["ano"] in anos
+        }
+    manifesto = carregar_manifesto()
+    manifesto.pop("csv", None)
+    assinaturas_anteriores = {} if forcar else manifesto.get("descontos", {})
+    if forcar:
+        for ano_mes in indice_meses:
+            manifesto["meses"].pop(ano_mes, None)
+    anos_usados = {ano for mes in indice_meses.values() for ano in mes["anos"]}
+    assinaturas_csv = {
+        os.path.abspath(arquivo_csv): assinatura_arquivo(
+            arquivo_csv, assinaturas_anteriores.get(os.path.abspath(arquivo_csv))
+        )
+        for ano in anos_usados
+        for arquivo_csv in entradas[ano]["csv"]
+    }
+    # Hash dos descontos de cada combinação de anos usada pelos meses
+    hash_por_anos = {
+        anos_mes: hash_descontos(
+            [
+                assinaturas_csv[os.path.abspath(arquivo)]
+                for ano in anos_mes
+                for arquivo in entradas[ano]["csv"]
+            ]
+        )
+        for anos_mes in {mes["anos"] for mes in indice_meses.values()}
+    }
+
+    # Selecionar apenas os meses cujas entradas mudaram desde a última execução
+    pendentes = []
+    for ano_mes, mes in indice_meses.items():
+        if perfil is not None and ano_mes != perfil:
+            continue
+        entrada_mes = manifesto["meses"].get(ano_mes)
+        assinatura_xlsx = assinatura_arquivo(
+            mes["xlsx"], entrada_mes.get("xlsx") if entrada_mes else None
+        )
+        hash_csv = hash_por_anos[mes["anos"]]
+        if ano_mes == perfil or mes_desatualizado(
+            entrada_mes,
+            assinatura_xlsx,
+            hash_csv,
+            saidas_mes(ano_mes),
+        ):
+            pendentes.append(
+                (ano_mes, mes["anos"], mes["xlsx"], assinatura_xlsx, hash_csv)
+            )
+        else:
+            # Atualiza mtime/tamanho para evitar recalcular o hash na próxima execução
+            entrada_mes["xlsx"] = assinatura_xlsx
+
+    if perfil is not None and not pendentes:
+        logging.warning(f"Arquivo Excel do mês {perfil} não encontrado. Finalizando...")
+        return
+
+    manifesto["descontos"] = manifesto.get("descontos", {}) | assinaturas_csv
+    if not pendentes:
+        salvar_manifesto(manifesto)
+        logging.info("Nenhum mês alterado desde a última execução.")
+        return
+
+    # Ler os CSV apenas dos anos usados pelos meses pendentes, já com o schema
+    # compacto
+    anos_pendentes = sorted(
+        {ano for _, anos_mes, _, _, _ in pendentes for ano in anos_mes}
+    )
+    try:
+        descontos = particionar_descontos_dos_anos(
+            {ano: entradas[ano]["csv"] for ano in anos_pendentes},
+            1 if perfil else workers,
+            streaming,
+        )
+        for ano in anos_pendentes:
+            if descontos[ano][1] is None:
+                logging.warning(f"Arquivo CSV de {ano} vazio. Ano ignorado.")
+
+        # Com o CSV alterado, um mês só é refeito se as suas linhas de
+        # desconto (ou o seu Excel) mudaram
+        pendentes = [
+            pendente
+            for pendente in pendentes
+            if descontos[pendente[1][-1]][1] is not None
+            and (
+                pendente[0] == perfil
+                or not mes_inalterado(
+                    manifesto["meses"].get(pendente[0]), pendente, descontos
+                )
+            )
+        ]
+        if not pendentes:
+            salvar_manifesto(manifesto)
+            logging.info("Nenhum mês com descontos ou cupons alterados.")
+            return
+        logging.info(
+            f"{len(pendentes)} de {len(indice_meses)} meses de "
+            f"{len({mes['ano'] for mes in indice_meses.values()})} ano(s) serão "
+            "reprocessados."
+        )
+
+        processar_meses_pendentes(
+            pendentes,
+            descontos,
+            1 if perfil else workers,
+            manifesto,
+            mes_perfil=perfil,
+        )
+    finally:
+        if streaming:
+            shutil.rmtree(diretorio_particoes_descontos, ignore_errors=True)
+    logging.info("Processamento dos arquivos CSV concluído.")
+
+
+# Função para processar os meses pendentes e registrar cada conclusão no manifesto
+def processar_meses_pendentes(
+    pendentes, descontos, workers, manifesto, mes_perfil=None
+):
+    if workers > 1:
+        resultados = processar_meses_em_paralelo(pendentes, descontos, workers)
+    else:
+        resultados = processar_meses_em_sequencia(pendentes, descontos, mes_perfil)
+
+    pendentes_por_mes = {pendente[0]: pendente for pendente in pendentes}
+    falhas = []
+    for ano_mes, erro in tqdm(
+        resultados, total=len(pendentes), desc="Processando arquivos Excel"
+    ):
+        if erro is not None:
+            logging.error(f"{ano_mes}: falha no processamento: {erro}")
+            falhas.append(ano_mes)
+            continue
+
+        # Registrar o mês concluído imediatamente, para que uma falha
+        # posterior não descarte o trabalho já feito
+        _, anos, arquivo_xlsx, assinatura_xlsx, hash_csv = pendentes_por_mes[ano_mes]
+        manifesto["meses"][ano_mes] = {
+            "xlsx": assinatura_xlsx,
+            "csv_hash": hash_csv,
+            "hash_entradas": hash_entradas_mes(
+                assinatura_xlsx, arquivo_xlsx, descontos, anos
+            ),
+        }
+        salvar_manifesto(manifesto)
+
+    if falhas:
+        raise RuntimeError(f"Meses com falha: {', '.join(sorted(falhas))}")
+
+
+# Função para ler o relatório em blocos, descartando logo na leitura as linhas
+# que não são de tabloide (ou que são da promoção "RAIZ")
+def ler_relatorio_filtrado(caminho, tamanho_bloco):
+    blocos = []
+    linhas_lidas = 0
+    with pd.read_csv(
+        caminho,
         sep=";",
         usecols=colunas_relatorio,
         decimal=",",
         dtype=tipo_dados_relatorio,
-    )
+        chunksize=tamanho_bloco,
+    ) as leitor:
+        for bloco in leitor:
+            linhas_lidas += len(bloco)
+            nomes = como_texto(bloco["Descricao"]).str.strip()
+            mascara = nomes.str.contains("TABLOIDE", case=False, na=False) & ~(
+                nomes.str.contains("RAIZ", case=False, na=False)
+            )
+            blocos.append(bloco[mascara])
+    if not blocos:
+        raise ValueError(f"{caminho}: relatório sem linhas.")
+    return pd.concat(blocos, ignore_index=True), linhas_lidas
 
-    # Padronizar valores
-    df["Nome Promocao"] = df["Descricao"].astype(str).str.strip()
-    df["Data Inicial"] = pd.to_datetime(df["Dt.Valid.Ini"], format="%d/%m/%y")
-    df["Data Final"] = pd.to_datetime(df["Dt.Valid.Fin"], format="%d/%m/%y")
-    df["SKU"] = df["Item"].astype(str).str.strip()
-    df["Nome Item"] = df["Descricao.1"].astype(str).str.strip()
-    df["Preco Vendido"] = pd.to_numeric(df["Pr.Un"], errors="coerce").round(2)
-    df["Preco Promocao"] = pd.to_numeric(df["Pr.Total"], errors="coerce").round(2)
-    df["Ativacao"] = df["Quant."].fillna(0).astype(int)
-
-    # Filtrar linhas que contenham a palavra "TABLOIDE" na coluna "Nome Promocao"
-    df = df[df["Nome Promocao"].str.contains("TABLOIDE", case=False, na=False)]
-
-    # Remover linhas que contenham a palavra "RAIZ" na coluna "Nome Promocao"
-    df = df[~df["Nome Promocao"].str.contains("RAIZ", case=False, na=False)]
-
-    arquivo_saida_csv = os.path.join(diretorio_saida, "relatorio_tratado.csv")
-    df.to_csv(
-        arquivo_saida_csv,
-        index=False,
-        encoding="utf-8",
-        sep=";",
-        columns=colunas_finais_relatorio,
-    )
+
+# Função para processar os relatórios de promoções de todos os anos em um único
+# relatório tratado
+def processar_relatorio():
+    logging.info("Iniciando processamento do relatório.")
+    arquivos = [
+        arquivo
+        for arquivos_ano in descobrir_anos().values()
+        for arquivo in arquivos_ano["relatorios"]
+    ]
+    if not arquivos:
+        raise FileNotFoundError(f"Nenhum relatório encontrado em {diretorio_arquivos}.")
+    with medir_etapa("leitura_relatorio") as etapa:
+        partes = []
+        etapa["linhas"] = 0
+        for arquivo in arquivos:
+            parte, linhas_lidas = ler_relatorio_filtrado(arquivo, tamanho_bloco_csv)
+            partes.append(parte)
+            etapa["linhas"] += linhas_lidas
+        df = partes[0] if len(partes) == 1 else pd.concat(partes, ignore_index=True)
+
+    with medir_etapa("normalizacao_relatorio") as etapa:
+        # Padronizar valores (apenas das linhas de tabloide)
+        df["Nome Promocao"] = como_texto(df["Descricao"]).str.strip()
+        df["Data Inicial"] = pd.to_datetime(df["Dt.Valid.Ini"], format="%d/%m/%y")
+        df["Data Final"] = pd.to_datetime(df["Dt.Valid.Fin"], format="%d/%m/%y")
+        df["SKU"] = como_texto(df["Item"]).str.strip()
+        df["Nome Item"] = como_texto(df["Descricao.1"]).str.strip()
+        df["Preco Vendido"] = pd.to_numeric(df["Pr.Un"], errors="coerce").round(2)
+        df["Preco Promocao"] = pd.to_numeric(df["Pr.Total"], errors="coerce").round(2)
+        df["Ativacao"] = df["Quant."].fillna(0).astype(int)
+
+        # Separar prefixo do período, modelo do encarte e limites do período
+        df = estruturar_promocoes(df)
+        etapa["linhas"] = len(df)
+
+    validar_formatos_saida()
+    with medir_etapa("gravacao_relatorio") as etapa:
+        for formato in formatos_saida:
+            arquivo_saida = os.path.join(
+                diretorio_saida, f"relatorio_tratado.{formato}"
+            )
+            gravar_saida(df, arquivo_saida, formato, colunas=colunas_finais_relatorio)
+        etapa["linhas"] = len(df)
     logging.info("Processamento do relatório concluído.")
 
 
+# Função para pré-calcular as métricas de todas as promoções do relatório e o
+# ranking de rentabilidade dos períodos
+def processar_metricas_promocoes(forcar=False):
+    arquivos = [arquivo_metricas(nivel) for nivel in (None, "sku", "loja")]
+    versao = versao_relatorio() + versao_caminho(diretorio_dataset)
+    if not versao:
+        logging.warning("Sem dados tratados para calcular métricas. Finalizando...")
+        return
+    ultima_alteracao = max(mtime for _, _, mtime in versao)
+    arquivos_ranking = [arquivo_ranking(formato) for formato in formatos_saida]
+    if not forcar and all(
+        os.path.exists(arquivo) and os.stat(arquivo).st_mtime_ns >= ultima_alteracao
+        for arquivo in arquivos + arquivos_ranking
+    ):
+        logging.info("Métricas das promoções já atualizadas.")
+        return
+
+    logging.info("Iniciando cálculo das métricas das promoções.")
+    with medir_etapa("metricas") as etapa:
+        relatorio = carregar_relatorio()
+        tabelas = calcular_metricas_promocoes(relatorio, carregar_vendas)
+        etapa["linhas"] = len(relatorio)
+    for arquivo, tabela in zip(arquivos, tabelas):
+        gravar_saida(tabela, arquivo, "parquet")
+
+    validar_formatos_saida()
+    ranking = ranquear_promocoes(tabelas[0])
+    for formato, arquivo in zip(formatos_saida, arquivos_ranking):
+        gravar_saida(ranking, arquivo, formato)
+    logging.info(f"Métricas calculadas para {len(tabelas[0])} promoções.")
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Processamento dos cupons e descontos."
+    )
+    parser.add_argument(
+        "--forcar",
+        action="store_true",
+        help="Reprocessa todos os meses, ignorando o manifesto.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Quantidade de processos usados para processar os meses em paralelo.",
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Lê o CSV de descontos em blocos, com partições mensais em disco.",
+    )
+    parser.add_argument(
+        "--perfil",
+        metavar="AAAA-MM",
+        help="Reprocessa apenas o mês indicado sob o cProfile, salvando "
+        "as estatísticas em perfil_AAAA-MM.prof.",
+    )
+    parser.add_argument(
+        "--arquivos",
+        help="Pasta com uma subpasta de entradas por ano, onde também ficam os "
+        "tratados e os caches (padrão: variável ANALISE_DIRETORIO_ARQUIVOS ou a "
+        "pasta files do projeto; instalado como pacote, files na pasta atual).",
+    )
+    parser.add_argument(
+        "--anos",
+        nargs="+",
+        metavar="AAAA",
+        help="Reprocessa apenas os meses dos anos indicados (o relatório "
+        "sempre reúne todos os anos).",
+    )
+    args = parser.parse_args()
+
+    configurar_log()
     logging.info("Início do script.")
     try:
         processar_relatorio()
-        processar_arquivo_csv()
+        processar_arquivo_csv(
+            forcar=args.forcar,
+            workers=args.workers,
+            streaming=args.streaming,
+            perfil=args.perfil,
+            anos=args.anos,
+        )
+        processar_metricas_promocoes(forcar=args.forcar)
         logging.info("Processamento finalizado com sucesso.")
     except Exception as e:
         logging.error(f"Erro durante a execução: {e}")
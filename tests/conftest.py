@@ -0,0 +1,25 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+import pytest
+
+# A configuração lê a pasta de arquivos ao ser importada: os testes usam uma
+# pasta temporária própria, sem tocar na pasta files do projeto
+pasta_testes = tempfile.mkdtemp(prefix="analise_diversas_")
+os.environ["ANALISE_DIRETORIO_ARQUIVOS"] = os.path.join(pasta_testes, "files")
+atexit.register(shutil.rmtree, pasta_testes, ignore_errors=True)
+
+
+# Dados sintéticos pequenos (três meses de 2024) na pasta de arquivos dos testes,
+# recriados a cada teste
+@pytest.fixture
+def arquivos():
+    from analise_diversas.config.config_transform import diretorio_arquivos
+    from analise_diversas.gerador_dados import gerar_dados
+
+    shutil.rmtree(diretorio_arquivos, ignore_errors=True)
+    gerar_dados(os.path.dirname(diretorio_arquivos), escala=0.05)
+    yield diretorio_arquivos
+    shutil.rmtree(diretorio_arquivos, ignore_errors=True)
@@ -0,0 +1,170 @@
+import pandas as pd
+import pytest
+
+from analise_diversas.analise import consultar_metricas, correlacionar_vendas
+
+
+@pytest.fixture
+def metricas(tmp_path):
+    # Métricas como gravadas pelo processamento e lidas de volta do Parquet
+    metricas = pd.DataFrame(
+        {
+            "Nome Promocao": ["TABLOIDE 01 A 13 - EF", "TABLOIDE 01 A 13 - CA"],
+            "Prefixo Periodo": ["TABLOIDE 01 A 13", "TABLOIDE 01 A 13"],
+            "Inicio Periodo": pd.to_datetime(["2024-07-01", "2024-07-01"]),
+            "Linhas Promocao": [2, 1],
+            "Vendas Carregadas": [True, True],
+            "Custo Encarte": [6400.0, 6400.0],
+            "Quantidade": [10.0, 5.0],
+            "Desconto Aplicado": [20.0, 10.0],
+            "Lucro Bruto": [5000.0, 2500.0],
+        }
+    )
+    arquivo = tmp_path / "metricas_promocoes.parquet"
+    metricas.to_parquet(arquivo, index=False)
+    return pd.read_parquet(arquivo)
+
+
+def promocoes_selecionadas(tipo_texto):
+    return pd.DataFrame(
+        {
+            "Nome Promocao": pd.Series(
+                [
+                    "TABLOIDE 01 A 13 - EF",
+                    "TABLOIDE 01 A 13 - EF",
+                    "TABLOIDE 01 A 13 - CA",
+                ],
+                dtype=tipo_texto,
+            ),
+            "Inicio Periodo": pd.to_datetime(["2024-07-01"] * 3),
+        }
+    )
+
+
+@pytest.mark.parametrize("tipo_texto", ["object", "string", "string[pyarrow]"])
+def test_metricas_pre_calculadas_valem_em_qualquer_tipo_de_texto(metricas, tipo_texto):
+    resultado = consultar_metricas(
+        metricas, promocoes_selecionadas(tipo_texto), "TABLOIDE 01 A 13 - EF"
+    )
+
+    assert resultado is not None
+    custo_encarte, _ = resultado
+    assert custo_encarte == 6400.0
+
+
+def test_selecao_diferente_das_metricas_calcula_ao_vivo(metricas):
+    promocoes = promocoes_selecionadas("string[pyarrow]").iloc[1:]
+
+    assert consultar_metricas(metricas, promocoes, "TABLOIDE 01 A 13 - EF") is None
+
+
+# Promoções com janelas sobrepostas para o mesmo SKU e vendas nos limites,
+# fora deles, abaixo da ativação e com o código de promoção excluído
+@pytest.fixture
+def promocoes_e_vendas():
+    promocoes = pd.DataFrame(
+        {
+            "Nome Promocao": [
+                "TABLOIDE 01 A 13 - EF",
+                "TABLOIDE 10 A 22 - EF",
+                "TABLOIDE 01 A 13 - CA",
+                "TABLOIDE 10 A 22 - CA",
+            ],
+            "Data Inicial": pd.to_datetime(
+                ["2024-07-01", "2024-07-10", "2024-07-01", "2024-07-10"]
+            ),
+            "Data Final": pd.to_datetime(
+                ["2024-07-13", "2024-07-22", "2024-07-13", "2024-07-22"]
+            ),
+            "SKU": ["101", "101", "202", "101"],
+            "Preco Vendido": [10.0, 10.0, 20.0, 10.0],
+            "Preco Promocao": [8.0, 7.5, 15.0, 9.0],
+            "Ativacao": [1, 2, 1, 1],
+        }
+    )
+    datas = [
+        "2024-06-30",
+        "2024-07-01",
+        "2024-07-09",
+        "2024-07-10",
+        "2024-07-11",
+        "2024-07-13",
+        "2024-07-14",
+        "2024-07-22",
+        "2024-07-23",
+    ]
+    linhas = []
+    for item in (101, 202, 303):
+        for loja in (1, 2):
+            for data in datas:
+                for quantidade, promocao in ((1.0, "N"), (3.0, "N"), (2.0, "P")):
+                    linhas.append(
+                        {
+                            "Loja": loja,
+                            "Data": pd.Timestamp(data),
+                            "Item": item,
+                            "Quantidade": quantidade,
+                            "Pr.Venda Total": quantidade * item / 10,
+                            "Promoção": promocao,
+                        }
+                    )
+    # Duas linhas iguais no mesmo cupom somam as quantidades
+    linhas.append(dict(linhas[4]))
+    return promocoes, pd.DataFrame(linhas)
+
+
+# Correlação anterior à junção por intervalo: para cada promoção, as vendas do
+# seu SKU dentro da validade, linha a linha
+def correlacionar_por_promocao(promocoes, vendas):
+    vendas = vendas[vendas["Promoção"] != "P"]
+    linhas = []
+    for _, promocao in promocoes.iterrows():
+        selecionadas = vendas[
+            (vendas["Item"].astype(str) == promocao["SKU"])
+            & (vendas["Data"] >= promocao["Data Inicial"])
+            & (vendas["Data"] <= promocao["Data Final"])
+            & (vendas["Quantidade"] >= promocao["Ativacao"])
+        ]
+        for _, venda in selecionadas.iterrows():
+            linhas.append(
+                {
+                    "Nome Promocao": promocao["Nome Promocao"],
+                    "SKU": promocao["SKU"],
+                    "Loja": venda["Loja"],
+                    "Data": venda["Data"],
+                    "Quantidade": venda["Quantidade"],
+                    "Valor Vendido": venda["Pr.Venda Total"],
+                    "Desconto Aplicado": (
+                        promocao["Preco Vendido"] - promocao["Preco Promocao"]
+                    )
+                    * venda["Quantidade"],
+                    "Lucro Bruto": promocao["Preco Promocao"] * venda["Quantidade"],
+                }
+            )
+    return pd.DataFrame(linhas)
+
+
+def totais_por_dia(correlacionados):
+    chaves = ["Nome Promocao", "SKU", "Loja", "Data"]
+    metricas = ["Quantidade", "Valor Vendido", "Desconto Aplicado", "Lucro Bruto"]
+    return (
+        correlacionados.groupby(chaves)[metricas]
+        .sum()
+        .reset_index()
+        .astype({"Loja": "int64"})
+    )
+
+
+def test_juncao_por_intervalo_equivale_ao_filtro_por_promocao(promocoes_e_vendas):
+    promocoes, vendas = promocoes_e_vendas
+
+    correlacionados = correlacionar_vendas(promocoes, vendas)
+    esperados = correlacionar_por_promocao(promocoes, vendas)
+
+    pd.testing.assert_frame_equal(
+        totais_por_dia(correlacionados), totais_por_dia(esperados)
+    )
+    # Os dias de limite entram e os vizinhos de fora não
+    datas = set(correlacionados["Data"].dt.strftime("%Y-%m-%d"))
+    assert {"2024-07-01", "2024-07-13", "2024-07-22"} <= datas
+    assert not {"2024-06-30", "2024-07-23"} & datas
@@ -0,0 +1,16 @@
+from analise_diversas import cache_resultados
+
+
+def test_modo_arrow_separa_as_entradas_do_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_resultados, "diretorio_cache_resultados", str(tmp_path))
+    calculos = []
+
+    def calcular():
+        calculos.append(cache_resultados.tipos_arrow)
+        return len(calculos)
+
+    assert cache_resultados.obter_ou_calcular(("teste", 1), calcular) == 1
+    assert cache_resultados.obter_ou_calcular(("teste", 1), calcular) == 1
+    monkeypatch.setattr(cache_resultados, "tipos_arrow", True)
+    assert cache_resultados.obter_ou_calcular(("teste", 1), calcular) == 2
+    assert calculos == [False, True]
@@ -0,0 +1,44 @@
+import pandas as pd
+
+from analise_diversas import consultas_sql, transform
+from analise_diversas.dataset_tratado import carregar_vendas
+
+
+def test_vendas_vem_do_dataset_mesmo_sem_parquet_mensal(arquivos, monkeypatch):
+    monkeypatch.setattr(transform, "formatos_saida", ["csv"])
+    transform.processar_arquivo_csv()
+
+    por_mes = consultas_sql.consultar(
+        "SELECT ano_mes, count(*) AS linhas FROM vendas GROUP BY ano_mes "
+        "ORDER BY ano_mes"
+    )
+    assert por_mes["ano_mes"].tolist() == ["2024-07", "2024-08", "2024-09"]
+    vendas = carregar_vendas("2024-07-01", "2024-09-30")
+    assert por_mes["linhas"].sum() == len(vendas)
+
+    # A loja vem da partição, no mesmo formato texto dos arquivos publicados
+    lojas = consultas_sql.consultar("SELECT DISTINCT Loja FROM vendas ORDER BY Loja")
+    assert lojas["Loja"].tolist() == sorted(vendas["Loja"].astype(str).unique())
+
+
+def test_carregar_vendas_promocoes_pelo_dataset(arquivos):
+    transform.processar_arquivo_csv()
+    promocoes = pd.DataFrame(
+        {
+            "SKU": ["10", "20"],
+            "Data Inicial": pd.to_datetime(["2024-07-01", "2024-08-10"]),
+            "Data Final": pd.to_datetime(["2024-07-13", "2024-08-22"]),
+        }
+    )
+
+    vendas = consultas_sql.carregar_vendas_promocoes(
+        promocoes, ["Loja", "Data", "Item", "Quantidade"]
+    )
+
+    esperadas = carregar_vendas("2024-07-01", "2024-08-22", skus=["10", "20"])
+    esperadas = esperadas[
+        ((esperadas["Item"] == 10) & (esperadas["Data"] <= "2024-07-13"))
+        | ((esperadas["Item"] == 20) & (esperadas["Data"] >= "2024-08-10"))
+    ]
+    assert len(vendas) == len(esperadas) > 0
+    assert set(vendas["Loja"]) <= set(esperadas["Loja"].astype(str))
@@ -0,0 +1,40 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from analise_diversas.instrumentacao import (
+    MedicaoMemoria,
+    intervalo_amostragem,
+    memoria_residente,
+)
+
+pytestmark = pytest.mark.skipif(
+    memoria_residente() is None, reason="memória residente indisponível"
+)
+
+
+def test_cada_medicao_registra_o_proprio_pico_e_acrescimo():
+    with MedicaoMemoria() as grande:
+        # Mantida por alguns intervalos, para que o amostrador veja o pico
+        dados = np.ones(64 * 2**20 // 8)
+        time.sleep(intervalo_amostragem * 6)
+        del dados
+    with MedicaoMemoria() as pequena:
+        pass
+
+    assert grande.pico - grande.inicial >= 32 * 2**20
+    # O pico da etapa anterior não contamina a seguinte
+    assert pequena.pico - pequena.inicial < 16 * 2**20
+    assert pequena.em_mb()["memoria_adicional_mb"] < 16
+
+
+def test_medicoes_simultaneas_dividem_uma_unica_thread():
+    with MedicaoMemoria(), MedicaoMemoria(), MedicaoMemoria():
+        amostradores = [
+            thread
+            for thread in threading.enumerate()
+            if thread.name == "amostrador_memoria"
+        ]
+        assert len(amostradores) == 1
@@ -0,0 +1,213 @@
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+from analise_diversas import remoto
+
+
+# Servidor HTTP local com ETag, requisições condicionais e Range (com If-Range),
+# servindo os arquivos de uma pasta e registrando as requisições recebidas
+class ServidorArquivos(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def conteudo(self):
+        caminho = os.path.join(self.server.pasta, self.path.lstrip("/"))
+        if not os.path.isfile(caminho):
+            self.send_error(404)
+            return None, None
+        with open(caminho, "rb") as arquivo:
+            dados = arquivo.read()
+        return dados, '"' + hashlib.md5(dados).hexdigest() + '"'
+
+    def do_HEAD(self):
+        self.server.requisicoes.append(("HEAD", self.path, None))
+        dados, etag = self.conteudo()
+        if dados is None:
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+
+    def do_GET(self):
+        faixa = self.headers.get("Range")
+        self.server.requisicoes.append(("GET", self.path, faixa))
+        # Simula a publicação de uma versão nova logo antes do primeiro GET
+        if self.server.antes_do_get is not None:
+            alterar, self.server.antes_do_get = self.server.antes_do_get, None
+            alterar()
+        dados, etag = self.conteudo()
+        if dados is None:
+            return
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        if_range = self.headers.get("If-Range")
+        if faixa and self.server.aceita_range and if_range in (None, etag):
+            inicio, fim = faixa.removeprefix("bytes=").split("-")
+            inicio, fim = int(inicio), min(int(fim), len(dados) - 1)
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {inicio}-{fim}/{len(dados)}")
+            dados = dados[inicio : fim + 1]
+        else:
+            self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+
+@pytest.fixture
+def servidor(tmp_path):
+    pasta = tmp_path / "publicado"
+    pasta.mkdir()
+    http = ThreadingHTTPServer(("127.0.0.1", 0), ServidorArquivos)
+    http.pasta = str(pasta)
+    http.requisicoes = []
+    http.aceita_range = True
+    http.antes_do_get = None
+    thread = threading.Thread(target=http.serve_forever, daemon=True)
+    thread.start()
+    yield http
+    http.shutdown()
+    http.server_close()
+
+
+@pytest.fixture(autouse=True)
+def cache_isolado(tmp_path, monkeypatch):
+    monkeypatch.setattr(remoto, "diretorio_cache_remoto", str(tmp_path / "cache"))
+    monkeypatch.setattr(remoto, "tamanho_bloco_remoto", 4096)
+    remoto._blocos.clear()
+    yield
+    remoto._blocos.clear()
+
+
+def url_de(servidor, nome):
+    return f"http://127.0.0.1:{servidor.server_address[1]}/{nome}"
+
+
+def gravar_vendas(servidor, nome, quantidade=1.0):
+    vendas = pd.DataFrame(
+        {
+            "Item": range(200_000),
+            "Loja": [indice % 7 for indice in range(200_000)],
+            "Quantidade": quantidade,
+        }
+    )
+    vendas.to_parquet(
+        os.path.join(servidor.pasta, nome), index=False, row_group_size=20_000
+    )
+    return vendas
+
+
+def requisicoes_get(servidor):
+    return [requisicao for requisicao in servidor.requisicoes if requisicao[0] == "GET"]
+
+
+def test_leitura_parcial_baixa_so_os_trechos_dos_skus(servidor):
+    vendas = gravar_vendas(servidor, "2025-02_tratado.parquet")
+    url = url_de(servidor, "2025-02_tratado.parquet")
+
+    df = remoto.ler_parquet_remoto(url, ["Loja", "Quantidade"], ["10", "150010"])
+
+    esperado = vendas[vendas["Item"].isin([10, 150010])][["Loja", "Quantidade"]]
+    pd.testing.assert_frame_equal(df, esperado.reset_index(drop=True))
+    faixas = [faixa for _, _, faixa in requisicoes_get(servidor)]
+    assert all(faixa is not None for faixa in faixas)
+    baixados = 0
+    for faixa in faixas:
+        inicio, fim = faixa.removeprefix("bytes=").split("-")
+        baixados += int(fim) - int(inicio) + 1
+    tamanho = os.path.getsize(os.path.join(servidor.pasta, "2025-02_tratado.parquet"))
+    assert baixados < tamanho / 2
+    assert len(os.listdir(os.path.join(remoto.diretorio_cache_remoto, "blocos"))) == 1
+
+
+def test_blocos_em_disco_evitam_novo_download_da_mesma_versao(servidor):
+    gravar_vendas(servidor, "2025-03_tratado.parquet")
+    url = url_de(servidor, "2025-03_tratado.parquet")
+    primeira = remoto.ler_parquet_remoto(url, ["Quantidade"], ["42"])
+
+    # Nova sessão do dashboard: o cache em memória está vazio
+    remoto._blocos.clear()
+    servidor.requisicoes.clear()
+    segunda = remoto.ler_parquet_remoto(url, ["Quantidade"], ["42"])
+
+    pd.testing.assert_frame_equal(primeira, segunda)
+    assert requisicoes_get(servidor) == []
+
+
+def test_nova_versao_do_arquivo_descarta_blocos_antigos(servidor):
+    gravar_vendas(servidor, "2025-04_tratado.parquet", quantidade=1.0)
+    url = url_de(servidor, "2025-04_tratado.parquet")
+    assert (
+        remoto.ler_parquet_remoto(url, ["Quantidade"], ["7"])["Quantidade"].eq(1).all()
+    )
+
+    gravar_vendas(servidor, "2025-04_tratado.parquet", quantidade=2.0)
+    remoto._blocos.clear()
+    df = remoto.ler_parquet_remoto(url, ["Quantidade"], ["7"])
+
+    assert df["Quantidade"].tolist() == [2.0]
+    pasta_url = os.listdir(os.path.join(remoto.diretorio_cache_remoto, "blocos"))[0]
+    versoes = os.listdir(
+        os.path.join(remoto.diretorio_cache_remoto, "blocos", pasta_url)
+    )
+    assert len(versoes) == 1
+
+
+def test_corpo_baixado_com_etag_e_reaproveitado(servidor):
+    vendas = gravar_vendas(servidor, "relatorio_tratado.parquet")
+    url = url_de(servidor, "relatorio_tratado.parquet")
+
+    primeiro = remoto.baixar(url)
+    segundo = remoto.baixar(url)
+    assert primeiro == segundo
+    assert requisicoes_get(servidor)[-1] == ("GET", "/relatorio_tratado.parquet", None)
+    assert remoto.versao_url(url)[0] is not None
+
+    # A leitura parcial usa o corpo já em disco, sem requisições Range
+    servidor.requisicoes.clear()
+    df = remoto.ler_parquet_remoto(url, ["Item"], ["3"])
+    assert df["Item"].tolist() == [3]
+    assert requisicoes_get(servidor) == []
+    pd.testing.assert_frame_equal(
+        remoto.carregar_parquet_remoto(url), vendas, check_dtype=False
+    )
+
+
+def test_arquivo_alterado_durante_a_leitura_recomeca_na_versao_nova(servidor):
+    gravar_vendas(servidor, "2025-05_tratado.parquet", quantidade=1.0)
+    url = url_de(servidor, "2025-05_tratado.parquet")
+    servidor.antes_do_get = lambda: gravar_vendas(
+        servidor, "2025-05_tratado.parquet", quantidade=3.0
+    )
+
+    df = remoto.ler_parquet_remoto(url, ["Item", "Quantidade"], ["99"])
+
+    assert df.to_dict("records") == [{"Item": 99, "Quantidade": 3.0}]
+    assert [metodo for metodo, _, _ in servidor.requisicoes].count("HEAD") == 2
+    # Nenhum bloco da versão nova ficou guardado sob a versão antiga
+    pasta_url = os.listdir(os.path.join(remoto.diretorio_cache_remoto, "blocos"))[0]
+    versoes = os.listdir(
+        os.path.join(remoto.diretorio_cache_remoto, "blocos", pasta_url)
+    )
+    assert len(versoes) == 1
+
+
+def test_servidor_sem_range_entrega_o_arquivo_inteiro(servidor):
+    vendas = gravar_vendas(servidor, "2025-06_tratado.parquet")
+    url = url_de(servidor, "2025-06_tratado.parquet")
+    servidor.aceita_range = False
+
+    df = remoto.ler_parquet_remoto(url, ["Loja"], ["12345"])
+
+    assert df["Loja"].tolist() == [vendas.loc[12345, "Loja"]]
+    assert len(requisicoes_get(servidor)) == 1
@@ -0,0 +1,197 @@
+import glob
+import os
+
+import pandas as pd
+import pytest
+
+from analise_diversas import transform
+from analise_diversas.config.config_transform import (
+    colunas_finais_relatorio,
+    diretorio_saida,
+)
+
+
+@pytest.fixture
+def meses_processados(monkeypatch):
+    processados = []
+    processar_mes = transform.processar_mes
+
+    def registrar(ano_mes, *args):
+        processados.append(ano_mes)
+        return processar_mes(ano_mes, *args)
+
+    monkeypatch.setattr(transform, "processar_mes", registrar)
+    return processados
+
+
+def acrescentar_desconto(arquivos, linha):
+    with open(os.path.join(arquivos, "2024", "desconto", "2024.csv"), "a") as csv:
+        csv.write(linha + "\n")
+
+
+def test_segunda_execucao_refaz_apenas_o_mes_com_descontos_novos(
+    arquivos, meses_processados
+):
+    transform.processar_arquivo_csv()
+    assert meses_processados == ["2024-07", "2024-08", "2024-09"]
+
+    meses_processados.clear()
+    transform.processar_arquivo_csv()
+    assert meses_processados == []
+
+    # Uma linha nova em setembro muda o hash do CSV, mas só setembro é refeito
+    acrescentar_desconto(
+        arquivos, "3;29/09/2024;999999;5;10,00;1,00;DINHEIRO;CLIENTE APP;CARLOS"
+    )
+    transform.processar_arquivo_csv()
+    assert meses_processados == ["2024-09"]
+
+    meses_processados.clear()
+    transform.processar_arquivo_csv()
+    assert meses_processados == []
+
+
+def test_streaming_gera_os_mesmos_hashes_dos_meses(arquivos, meses_processados):
+    transform.processar_arquivo_csv()
+    acrescentar_desconto(
+        arquivos, "3;02/07/2024;999999;5;10,00;1,00;DINHEIRO;CLIENTE APP;CARLOS"
+    )
+    meses_processados.clear()
+    transform.processar_arquivo_csv(streaming=True)
+    assert meses_processados == ["2024-07"]
+
+
+def test_execucao_interrompida_retoma_apenas_o_mes_com_falha(
+    arquivos, meses_processados, monkeypatch
+):
+    gravar_mes_dataset = transform.gravar_mes_dataset
+
+    def falhar_em_agosto(df, ano_mes):
+        if ano_mes == "2024-08":
+            raise OSError("disco cheio")
+        return gravar_mes_dataset(df, ano_mes)
+
+    monkeypatch.setattr(transform, "gravar_mes_dataset", falhar_em_agosto)
+    with pytest.raises(RuntimeError, match="2024-08"):
+        transform.processar_arquivo_csv()
+    assert set(transform.carregar_manifesto()["meses"]) == {"2024-07", "2024-09"}
+
+    monkeypatch.setattr(transform, "gravar_mes_dataset", gravar_mes_dataset)
+    meses_processados.clear()
+    transform.processar_arquivo_csv()
+    assert meses_processados == ["2024-08"]
+    assert set(transform.carregar_manifesto()["meses"]) == {
+        "2024-07",
+        "2024-08",
+        "2024-09",
+    }
+
+
+def relatorio_tratado():
+    return pd.read_parquet(os.path.join(diretorio_saida, "relatorio_tratado.parquet"))
+
+
+def test_prefixos_repetidos_mantem_o_nome_original(arquivos):
+    transform.processar_relatorio()
+
+    relatorio = relatorio_tratado()
+    originais = pd.concat(
+        pd.read_csv(arquivo, sep=";", usecols=["Descricao"])
+        for arquivo in glob.glob(os.path.join(arquivos, "2024", "relatorios", "*.csv"))
+    )
+    tabloides = originais["Descricao"].str.contains("TABLOIDE") & ~originais[
+        "Descricao"
+    ].str.contains("RAIZ")
+    assert set(relatorio["Nome Promocao"]) == set(originais["Descricao"][tabloides])
+    # O mesmo prefixo em meses diferentes fica separado pelo início do período
+    inicios = relatorio.groupby("Prefixo Periodo", observed=True)["Inicio Periodo"]
+    assert inicios.nunique().max() == 3
+
+
+def test_relatorio_sem_tabloides_gera_relatorio_vazio(arquivos):
+    for arquivo in glob.glob(os.path.join(arquivos, "2024", "relatorios", "*.csv")):
+        relatorio = pd.read_csv(arquivo, sep=";", dtype=str)
+        relatorio["Descricao"] = relatorio["Descricao"].str.replace(
+            "TABLOIDE", "OFERTA"
+        )
+        relatorio.to_csv(arquivo, sep=";", index=False)
+
+    transform.processar_relatorio()
+
+    relatorio = relatorio_tratado()
+    assert relatorio.empty
+    assert list(relatorio.columns) == colunas_finais_relatorio
+
+
+# Descontos e cupons da mesma loja e caixa; o dia vem da paridade do documento
+def descontos_e_cupons(documentos_descontos, documentos_cupons):
+    datas = pd.to_datetime(["2024-07-01", "2024-07-02"])
+    descontos = pd.DataFrame(
+        {
+            "Lj": pd.array([1] * len(documentos_descontos), dtype="Int16"),
+            "Data": datas[[documento % 2 for documento in documentos_descontos]],
+            "Docum": pd.array(documentos_descontos, dtype="Int64"),
+            "CX": pd.array([3] * len(documentos_descontos), dtype="Int16"),
+            "Desconto": [float(i) for i in range(len(documentos_descontos))],
+        }
+    )
+    cupons = pd.DataFrame(
+        {
+            "Loja": pd.array([1] * len(documentos_cupons), dtype="Int16"),
+            "Num.Cupom": pd.array(documentos_cupons, dtype="Int64"),
+            "Data": datas[[documento % 2 for documento in documentos_cupons]],
+            "PDV": pd.array([3] * len(documentos_cupons), dtype="Int16"),
+            "Item": range(len(documentos_cupons)),
+        }
+    )
+    return descontos, cupons
+
+
+def merge_pelas_quatro_colunas(descontos, cupons):
+    return pd.merge(
+        descontos,
+        cupons,
+        left_on=transform.chaves_descontos,
+        right_on=transform.chaves_cupons,
+        how="inner",
+    )
+
+
+@pytest.mark.parametrize("ordenado", [False, True])
+@pytest.mark.parametrize(
+    "documentos_descontos, documentos_cupons",
+    [
+        # Um desconto por cupom, vários itens por cupom e chaves sem par
+        ([10, 11, 12, 13, 14, 15], [15, 10, 12, 12, 99, 10, 14, 14, 11, 12]),
+        # Descontos repetidos para o mesmo cupom
+        ([10, 11, 10, 12, 11, 10], [10, 12, 11, 10, 12, 12, 10, 11]),
+    ],
+)
+def test_chave_inteira_combina_como_o_merge_do_pandas(
+    documentos_descontos, documentos_cupons, ordenado
+):
+    descontos, cupons = descontos_e_cupons(documentos_descontos, documentos_cupons)
+
+    combinado = transform.combinar_descontos_cupons(descontos, cupons, ordenado)
+
+    pd.testing.assert_frame_equal(
+        combinado, merge_pelas_quatro_colunas(descontos, cupons)
+    )
+
+
+def test_chave_fora_dos_bits_usa_o_merge_pelas_quatro_colunas(caplog):
+    documento_grande = 1 << transform.bits_chave_cupom["documento"]
+    descontos, cupons = descontos_e_cupons(
+        [10, documento_grande, 12], [12, documento_grande, 10, 10]
+    )
+    assert (
+        transform.chave_cupom(*(descontos[c] for c in transform.chaves_descontos))
+        is None
+    )
+
+    combinado = transform.combinar_descontos_cupons(descontos, cupons)
+
+    pd.testing.assert_frame_equal(
+        combinado, merge_pelas_quatro_colunas(descontos, cupons)
+    )
+    assert "fora dos limites" in caplog.text